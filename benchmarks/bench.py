@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from benchmarks.fixtures import FixtureClient, load_corpus
+from run import get_scraper
+from scrapers.scraper import GameContext
+from utils import utils
+from utils.constants import *
+from writers.CSV.writer import Writer as CSVWriter
+from writers.writer import Writer
+
+# runs the stages of a season scrape over a recorded corpus, with no network:
+#   games   parsing the competition calendar (get_games)
+#   decode  parsing the Matches and Events payloads of every game (parse_actions)
+#   clean   linking and cleaning the actions (clean_actions)
+#   write   writing the play-by-play with the CSV writer
+
+
+class NullWriter(Writer):
+	def check_and_insert_league(self, content: dict):
+		return content['name']
+
+	def check_and_insert_season(self, content: dict):
+		return f'{content["start"] % 100:02d}-{content["end"] % 100:02d}'
+
+	def check_and_insert_edition(self, content: dict):
+		return f'{content["season_id"]} {content["league_id"]}'
+
+	def check_and_insert_game(self, content: dict):
+		return f'{content["date"].date()}:{content["home_team_id"]}-{content["away_team_id"]}'
+
+	def check_and_insert_team(self, content: dict):
+		return content['name']
+
+	def check_and_insert_franchise(self, content: dict):
+		return content['name']
+
+	def check_and_insert_edition_participant(self, content: dict):
+		return None
+
+	def check_and_insert_actions(self, actions):
+		return None
+
+	def insert_player_and_contract(self, player, contract):
+		return player['full_name']
+
+	def insert_boxscores(self, teams: list, players: list):
+		return None
+
+
+def get_commit():
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def get_peak_rss_kb():
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# bytes on macOS, kilobytes elsewhere
+	return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_once(info, payloads, output_dir):
+	scraper = get_scraper(info['league'], NullWriter())
+	scraper.client = FixtureClient(payloads)
+
+	league = scraper.get_league()
+	season = {'start': info['start'], 'end': info['end'], 'code': info['code'], 'players': dict(), 'teams': dict(), 'rosters': dict()}
+	season['season_id'] = f'{season["start"] % 100:02d}-{season["end"] % 100:02d}'
+	edition = {'season_id': season['season_id'], 'edition_id': f'{season["season_id"]} {league["name"]}'}
+	scraper.current_season = season
+	scraper.current_edition = edition
+
+	timings = dict()
+
+	start = time.perf_counter()
+	games = scraper.get_games()
+	timings['games'] = time.perf_counter() - start
+
+	contexts = []
+	for game in games:
+		if game['status'] not in (PLAYED, LIVE):
+			continue
+		game['home_team_id'] = game['home_team']
+		game['away_team_id'] = game['away_team']
+		game['game_id'] = f'{game["date"].date()}:{game["home_team"]}-{game["away_team"]}'
+		contexts.append(GameContext(league, season, edition, game))
+
+	start = time.perf_counter()
+	raw_batches = []
+	for context in contexts:
+		website_id = str(context.game['website_id'])
+		raw_batches.append(scraper.parse_actions(context, payloads[('Matches', website_id)], payloads[('Events', website_id)]))
+	timings['decode'] = time.perf_counter() - start
+
+	start = time.perf_counter()
+	batches = [scraper.clean_actions(raw_actions, context) for context, raw_actions in zip(contexts, raw_batches)]
+	timings['clean'] = time.perf_counter() - start
+
+	writer = CSVWriter(dir=output_dir)
+	writer.check_and_insert_league(league)
+	writer.check_and_insert_season(season)
+	start = time.perf_counter()
+	for actions in batches:
+		writer.check_and_insert_actions(actions)
+	writer.finish_season()
+	timings['write'] = time.perf_counter() - start
+
+	scraper.client.close()
+
+	counts = {
+		'games': len(contexts),
+		'raw_actions': sum(len(raw_actions) for raw_actions in raw_batches),
+		'actions': sum(len(actions) for actions in batches),
+	}
+
+	return timings, counts
+
+
+def run(corpus_dir, repeat=5):
+	info, payloads = load_corpus(corpus_dir)
+
+	best = dict()
+	counts = None
+	output_dir = tempfile.mkdtemp(prefix='waterpolo_bench_')
+	try:
+		for _ in range(repeat):
+			timings, counts = run_once(info, payloads, output_dir)
+			for stage, seconds in timings.items():
+				best[stage] = min(seconds, best.get(stage, seconds))
+	finally:
+		shutil.rmtree(output_dir, ignore_errors=True)
+
+	stages = dict()
+	for stage, seconds in best.items():
+		actions = counts['raw_actions'] if stage == 'decode' else counts['actions']
+		stages[stage] = {
+			'seconds': seconds,
+			'games_per_sec': counts['games'] / seconds if seconds else None,
+			'actions_per_sec': actions / seconds if seconds and stage != 'games' else None,
+		}
+
+	return {
+		'commit': get_commit(),
+		'date': datetime.now().isoformat(timespec='seconds'),
+		'python': platform.python_version(),
+		'corpus': info | counts,
+		'repeat': repeat,
+		'stages': stages,
+		'peak_rss_kb': get_peak_rss_kb(),
+		'clean_name_cache': utils.get_clean_name_stats(),
+	}
+
+
+def compare(result, baseline, threshold=0.1):
+	# prints the change of throughput of every stage, returns the stages that got slower than the threshold
+	regressions = []
+
+	for stage, values in result['stages'].items():
+		if stage not in baseline['stages']:
+			continue
+
+		old = baseline['stages'][stage]['seconds']
+		new = values['seconds']
+		change = (new - old) / old if old else 0
+		print(f'{stage:>8}: {old * 1000:9.2f} ms -> {new * 1000:9.2f} ms ({change:+.1%})')
+
+		if change > threshold:
+			regressions.append(stage)
+
+	old_rss = baseline.get('peak_rss_kb')
+	if old_rss:
+		print(f'peak RSS: {old_rss} kB -> {result["peak_rss_kb"]} kB')
+
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the scraping stages over a recorded corpus')
+	parser.add_argument('corpus', type=str, help='The directory of the corpus, see benchmarks/fixtures.py')
+	parser.add_argument('-n', '--repeat', type=int, default=5, help='How many times to run each stage, the best time is kept. Default is 5')
+	parser.add_argument('-o', '--output', type=str, help='The json file where to save the results, default is benchmarks/results/<commit>.json')
+	parser.add_argument('-c', '--compare', type=str, help='A previous results file to compare with')
+	parser.add_argument('--threshold', type=float, default=0.1, help='The slowdown above which a stage is a regression, default is 0.1')
+	args = parser.parse_args()
+
+	result = run(args.corpus, repeat=args.repeat)
+
+	for stage, values in result['stages'].items():
+		actions_per_sec = f'{values["actions_per_sec"]:12.0f} actions/s' if values['actions_per_sec'] else ''
+		print(f'{stage:>8}: {values["seconds"] * 1000:9.2f} ms {values["games_per_sec"]:10.1f} games/s {actions_per_sec}')
+	print(f'peak RSS: {result["peak_rss_kb"]} kB')
+
+	output = args.output if args.output else os.path.join('benchmarks', 'results', f'{result["commit"] or "results"}.json')
+	directory = os.path.dirname(output)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	with open(output, 'w', encoding='utf-8') as f:
+		json.dump(result, f, indent=1)
+
+	if args.compare:
+		with open(args.compare, 'r', encoding='utf-8') as f:
+			baseline = json.load(f)
+
+		regressions = compare(result, baseline, threshold=args.threshold)
+		if regressions:
+			print(f'Regressions in: {", ".join(regressions)}')
+			exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,49 @@
+import json
+import os
+from scrapers.general.arena import ArenaClient
+
+# a corpus is a directory with the payloads of the arena API laid out as the routes that return them:
+#   corpus.json                     {"league": "LEN", "start": 2022, "end": 2023, "code": 2124}
+#   Competitions/<code>.json
+#   Matches/<website_id>.json
+#   Events/<website_id>.json
+ROUTES = ('Competitions', 'Matches', 'Events')
+
+
+def get_path(directory, route, website_id):
+	return os.path.join(directory, route, f'{website_id}.json')
+
+
+def load_corpus(directory):
+	with open(os.path.join(directory, 'corpus.json'), 'r', encoding='utf-8') as f:
+		info = json.load(f)
+
+	payloads = dict()
+	for route in ROUTES:
+		route_dir = os.path.join(directory, route)
+		if not os.path.isdir(route_dir):
+			continue
+
+		for filename in os.listdir(route_dir):
+			with open(os.path.join(route_dir, filename), 'r', encoding='utf-8') as f:
+				payloads[(route, filename[:-len('.json')])] = json.load(f)
+
+	return info, payloads
+
+
+def save_payload(directory, route, website_id, payload):
+	path = get_path(directory, route, website_id)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+
+	with open(path, 'w', encoding='utf-8') as f:
+		json.dump(payload, f)
+
+
+class FixtureClient(ArenaClient):
+	# serves a corpus already loaded in memory, so that benchmarks never touch the network nor the disk
+	def __init__(self, payloads):
+		super().__init__(headers=dict(), broker=None)
+		self.payloads = payloads
+
+	async def get_json(self, route, website_id, cache=False, ttl=None):
+		return self.payloads[(route, str(website_id))]
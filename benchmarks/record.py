@@ -0,0 +1,47 @@
+import argparse
+import json
+import os
+from benchmarks.fixtures import save_payload
+from run import get_scraper
+
+# records the payloads of a whole season from the arena API, in the layout read by the benchmarks
+
+
+def record(league, start, directory):
+	scraper = get_scraper(league, writer=None)
+	if scraper is None:
+		raise ValueError(f'Unknown league {league}')
+
+	code = scraper.season_mapping[start]
+	client = scraper.client
+
+	competition = client.run(client.get_competition(code))
+	save_payload(directory, 'Competitions', code, competition)
+
+	website_ids = [match['id'] for match in competition['matches'] if match['status'] == 'Finished']
+	futures = [client.submit(client.get_match_and_events(website_id, finished=True)) for website_id in website_ids]
+
+	for website_id, future in zip(website_ids, futures):
+		info_response, response = future.result()
+		save_payload(directory, 'Matches', website_id, info_response)
+		save_payload(directory, 'Events', website_id, response)
+
+	with open(os.path.join(directory, 'corpus.json'), 'w', encoding='utf-8') as f:
+		json.dump({'league': league, 'start': start, 'end': start + 1, 'code': code, 'synthetic': False}, f)
+
+	return len(website_ids)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Record the arena API payloads of a season')
+	parser.add_argument('-l', '--league', type=str, required=True, help='The league to record, such as LEN')
+	parser.add_argument('-s', '--season', type=int, required=True, help='The starting year of the season, such as 2022')
+	parser.add_argument('-o', '--output', type=str, required=True, help='The directory where to write the corpus')
+	args = parser.parse_args()
+
+	games = record(args.league, args.season, args.output)
+	print(f'Recorded {games} games in {args.output}')
+
+
+if __name__ == '__main__':
+	main()
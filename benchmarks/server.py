@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from aiohttp import web
+from benchmarks.fixtures import load_corpus
+
+# a stand-in for the arena API serving a corpus (see benchmarks/fixtures.py), to load test the scrapers without
+# hammering the real one. Point run.py to it with --api_url http://localhost:8080/api --api_token <token>
+ERROR_STATUSES = (500, 502, 503)
+PERCENTILES = (50, 90, 95, 99)
+
+
+class ArenaServer:
+	def __init__(self, payloads, token=None, latency=0.0, jitter=0.0, rate_limited=0.0, server_errors=0.0, retry_after=1,
+	             max_connections=None, max_queue=None, seed=None, live=(), live_duration=120.0):
+		# latency and jitter are in seconds; the jitter is the mean of an exponential delay added to the latency, which
+		# gives the long tail of a real server. rate_limited and server_errors are the probabilities of answering 429 and
+		# 5xx. Requests above max_connections wait for a free slot, those above max_queue are refused with a 503. The live
+		# games are replayed from the start of the server: they are in progress for live_duration seconds, during which
+		# their events are revealed little by little
+		self.raw_payloads = payloads
+		self.payloads = {key: json.dumps(payload).encode('utf-8') for key, payload in payloads.items()}
+		self.etags = {key: f'"{hashlib.sha1(body).hexdigest()}"' for key, body in self.payloads.items()}
+		self.token = token
+		self.latency = latency
+		self.jitter = jitter
+		self.rate_limited = rate_limited
+		self.server_errors = server_errors
+		self.retry_after = retry_after
+		self.max_connections = max_connections
+		self.max_queue = max_queue
+		self.live = {str(website_id) for website_id in live}
+		self.live_duration = live_duration
+		self.live_started_at = time.monotonic()
+		self.random = random.Random(seed)
+		self.semaphore = None
+		self.waiting = 0
+		self.in_flight = 0
+		self.max_in_flight = 0
+		self.statuses = dict()
+		self.durations = []
+		self.payload_bytes = 0
+		self.started_at = time.monotonic()
+
+	def get_app(self):
+		app = web.Application()
+		app.router.add_get('/api/{route}/{website_id}', self.handle)
+		app.router.add_get('/stats', self.handle_stats)
+		app.router.add_post('/stats/reset', self.handle_reset)
+		return app
+
+	async def handle(self, request):
+		start = time.monotonic()
+
+		if self.max_queue is not None and self.waiting >= self.max_queue:
+			return self.respond(start, web.json_response({'message': 'Too many connections'}, status=503))
+
+		if self.semaphore is None and self.max_connections:
+			self.semaphore = asyncio.Semaphore(self.max_connections)
+
+		self.waiting += 1
+		try:
+			if self.semaphore is not None:
+				await self.semaphore.acquire()
+		finally:
+			self.waiting -= 1
+
+		self.in_flight += 1
+		self.max_in_flight = max(self.in_flight, self.max_in_flight)
+		try:
+			response = await self.serve(request)
+		finally:
+			self.in_flight -= 1
+			if self.semaphore is not None:
+				self.semaphore.release()
+
+		return self.respond(start, response)
+
+	async def serve(self, request):
+		delay = self.latency + (self.random.expovariate(1 / self.jitter) if self.jitter > 0 else 0)
+		if delay > 0:
+			await asyncio.sleep(delay)
+
+		if self.token is not None and request.headers.get('Authorization') != self.token:
+			return web.json_response({'message': 'Unauthorized'}, status=401)
+
+		draw = self.random.random()
+		if draw < self.rate_limited:
+			return web.json_response({'message': 'Too many requests'}, status=429, headers={'Retry-After': str(self.retry_after)})
+		if draw < self.rate_limited + self.server_errors:
+			return web.json_response({'message': 'Server error'}, status=self.random.choice(ERROR_STATUSES))
+
+		key = (request.match_info['route'], request.match_info['website_id'])
+		body, etag = self.get_body(key)
+		if body is None:
+			return web.json_response({'message': 'Not found'}, status=404)
+
+		if request.headers.get('If-None-Match') == etag:
+			return web.Response(status=304, headers={'ETag': etag})
+
+		response = web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+		response.enable_compression()
+		return response
+
+	def get_body(self, key):
+		route, website_id = key
+		progress = (time.monotonic() - self.live_started_at) / self.live_duration if self.live_duration else 1.0
+		if progress >= 1.0 or key not in self.payloads or route not in ('Competitions', 'Events') or \
+				(route == 'Events' and website_id not in self.live):
+			return self.payloads.get(key), self.etags.get(key)
+
+		payload = self.raw_payloads[key]
+		if route == 'Events':
+			payload = payload[:int(len(payload) * progress)]
+		else:
+			matches = [match | {'status': 'In_Progress'} if str(match['id']) in self.live else match for match in payload['matches']]
+			payload = payload | {'matches': matches}
+
+		body = json.dumps(payload).encode('utf-8')
+		return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+	def respond(self, start, response):
+		self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+		self.durations.append(time.monotonic() - start)
+		if response.body is not None:
+			self.payload_bytes += len(response.body)
+
+		return response
+
+	def get_stats(self):
+		elapsed = time.monotonic() - self.started_at
+		durations = sorted(self.durations)
+
+		stats = {
+			'requests': len(durations),
+			'requests_per_sec': len(durations) / elapsed if elapsed else None,
+			'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+			'max_in_flight': self.max_in_flight,
+			'payload_bytes': self.payload_bytes,
+		}
+		for percentile in PERCENTILES:
+			index = min(len(durations) - 1, len(durations) * percentile // 100)
+			stats[f'p{percentile}_ms'] = durations[index] * 1000 if durations else None
+
+		return stats
+
+	async def handle_stats(self, request):
+		return web.json_response(self.get_stats())
+
+	async def handle_reset(self, request):
+		self.statuses = dict()
+		self.durations = []
+		self.payload_bytes = 0
+		self.max_in_flight = self.in_flight
+		self.started_at = time.monotonic()
+		return web.json_response(self.get_stats())
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Serve a corpus of arena API payloads, see benchmarks/fixtures.py')
+	parser.add_argument('corpus', type=str, help='The directory of the corpus')
+	parser.add_argument('--host', type=str, default='localhost', help='The interface to listen on, default is localhost')
+	parser.add_argument('-p', '--port', type=int, default=8080, help='The port to listen on, default is 8080')
+	parser.add_argument('--token', type=str, help='The Authorization header that requests must carry, any is accepted if not given')
+	parser.add_argument('--latency', type=float, default=0, help='The delay of every response in milliseconds, default is 0')
+	parser.add_argument('--jitter', type=float, default=0,
+	                    help='The mean of a random delay in milliseconds added to the latency, default is 0')
+	parser.add_argument('--rate_limited', type=float, default=0, help='The share of requests answered with a 429, default is 0')
+	parser.add_argument('--server_errors', type=float, default=0, help='The share of requests answered with a 5xx, default is 0')
+	parser.add_argument('--retry_after', type=int, default=1, help='The Retry-After of the 429 responses in seconds, default is 1')
+	parser.add_argument('--max_connections', type=int, help='How many requests are served at the same time, unlimited if not given')
+	parser.add_argument('--max_queue', type=int, help='How many requests can wait for a free connection before being refused with a 503')
+	parser.add_argument('--seed', type=int, help='The seed of the random delays and errors')
+	parser.add_argument('--live', type=str, nargs='+', default=[], help='The website ids of the games to replay as if they were in progress')
+	parser.add_argument('--live_duration', type=float, default=120,
+	                    help='How many seconds the replayed games are in progress, from the start of the server. Default is 120')
+	args = parser.parse_args()
+
+	_, payloads = load_corpus(args.corpus)
+	server = ArenaServer(payloads, token=args.token, latency=args.latency / 1000, jitter=args.jitter / 1000,
+	                     rate_limited=args.rate_limited, server_errors=args.server_errors, retry_after=args.retry_after,
+	                     max_connections=args.max_connections, max_queue=args.max_queue, seed=args.seed, live=args.live,
+	                     live_duration=args.live_duration)
+
+	web.run_app(server.get_app(), host=args.host, port=args.port, print=print)
+
+
+if __name__ == '__main__':
+	main()
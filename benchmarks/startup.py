@@ -0,0 +1,75 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# measures how long run.py takes to start, each case in a fresh interpreter, and checks that the heavy dependencies are
+# only imported by the code paths that need them
+CASES = {
+	'help': ['run.py', '-h'],
+	'imports': ['-c', 'import run, scrapers.leagues.LEN, scrapers.leagues.WC, scrapers.leagues.EC, writers.CSV.writer'],
+}
+
+# imported only to get a token with the browser, to send requests, to build DataFrames or to parse html pages
+HEAVY_MODULES = ('selenium', 'seleniumwire', 'webdriver_manager', 'aiohttp', 'pandas', 'numpy', 'bs4', 'requests', 'pyarrow')
+
+LOADED_MODULES = f'''
+import sys, run, scrapers.leagues.LEN, scrapers.leagues.WC, scrapers.leagues.EC, writers.CSV.writer
+print(",".join(module for module in {HEAVY_MODULES!r} if module in sys.modules))
+'''
+
+
+def time_case(arguments, repeat):
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+		timings.append(time.perf_counter() - start)
+
+	return {'min_ms': min(timings) * 1000, 'median_ms': statistics.median(timings) * 1000}
+
+
+def get_loaded_modules():
+	output = subprocess.run([sys.executable, '-c', LOADED_MODULES], capture_output=True, text=True, check=True).stdout.strip()
+	return output.split(',') if output else []
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Measure the startup time of run.py')
+	parser.add_argument('-n', '--repeat', type=int, default=5, help='How many times to run each case, default is 5')
+	parser.add_argument('-o', '--output', type=str, help='The json file where to save the results')
+	parser.add_argument('--max_ms', type=float, help='Fail if the median of a case is slower than this many milliseconds')
+	args = parser.parse_args()
+
+	result = {
+		'python': sys.version.split()[0],
+		'cases': {name: time_case(arguments, args.repeat) for name, arguments in CASES.items()},
+		'heavy_modules': get_loaded_modules(),
+	}
+
+	for name, timings in result['cases'].items():
+		print(f'{name:>8}: {timings["median_ms"]:8.1f} ms (min {timings["min_ms"]:.1f} ms)')
+
+	if args.output:
+		with open(args.output, 'w', encoding='utf-8') as f:
+			json.dump(result, f, indent=1)
+
+	failed = False
+	if result['heavy_modules']:
+		print(f'Imported at startup: {", ".join(result["heavy_modules"])}')
+		failed = True
+
+	if args.max_ms is not None:
+		slow = [name for name, timings in result['cases'].items() if timings['median_ms'] > args.max_ms]
+		if slow:
+			print(f'Slower than {args.max_ms} ms: {", ".join(slow)}')
+			failed = True
+
+	if failed:
+		exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import random
+from benchmarks.fixtures import save_payload
+
+# generates a corpus shaped like the payloads of the arena API, with a double round robin between the given number of
+# teams. It is synthetic data, meant to run the benchmarks when no recorded corpus is at hand
+
+PERIODS = ['First_Period', 'Second_Period', 'Third_Period', 'Fourth_Period']
+NAMES = ['Marko', 'Ivan', 'Luca', 'José', 'Dušan', 'Andrea', 'Gergő', 'Filip', 'Nikola', 'François', 'Mc Donald', 'O’Neil']
+EVENT_TYPES = ['Shot', 'Shot', 'Shot', 'Turnover', 'Exclusion', 'Exclusion', 'Card', 'Timeout', 'Swim_Off']
+
+
+def get_roster(rnd, team_name, first_player_id):
+	roster = []
+	for number in range(1, 14):
+		roster.append({
+			'playerId': first_player_id + number,
+			'player': {
+				'name': rnd.choice(NAMES),
+				'surname': f'{rnd.choice(NAMES)} {number}',
+				'height': f'{rnd.randint(180, 205)} cm',
+				'weight': f'{rnd.randint(80, 110)} kg',
+				'dominantHand': rnd.choice(['Right', 'Left']),
+			},
+			'position': 'Goalkeeper' if number in (1, 13) else rnd.choice(['Centre', 'Wing', 'Driver']),
+			'team': {'name': team_name},
+			'number': number,
+		})
+
+	return roster
+
+
+def get_player(rnd, rosters, team_id):
+	player = rnd.choice(rosters[team_id])
+	return {'playerId': player['playerId'], 'teamId': team_id}
+
+
+def get_event(rnd, event_id, period, home_id, away_id, rosters):
+	team_id, opponent_id = rnd.choice([(home_id, away_id), (away_id, home_id)])
+	player = get_player(rnd, rosters, team_id)
+	opponent = get_player(rnd, rosters, opponent_id)
+	event_type = rnd.choice(EVENT_TYPES)
+
+	event = {
+		'id': event_id,
+		'period': period,
+		'minute': rnd.randint(0, 7),
+		'seconds': rnd.randint(0, 59),
+		'type': event_type,
+	}
+
+	if event_type == 'Shot':
+		is_goal = rnd.random() < 0.4
+		assist = get_player(rnd, rosters, team_id) if is_goal and rnd.random() < 0.5 else None
+		save = opponent if not is_goal and rnd.random() < 0.6 else None
+		block = opponent if not is_goal and save is None and rnd.random() < 0.5 else None
+		event['shot'] = {
+			'isGoal': is_goal,
+			'teamId': team_id,
+			'takenBy': player,
+			'type': rnd.choice(['Regular_Attack', 'Regular_Attack', 'Power_Play', 'Penalty']),
+			'locationX': round(rnd.uniform(0, 20), 2),
+			'locationY': round(rnd.uniform(0, 10), 2),
+			'targetX': round(rnd.uniform(0, 3), 2),
+			'targetY': round(rnd.uniform(0, 1), 2),
+			'assistedById': assist and assist['playerId'],
+			'assistedBy': assist,
+			'savedById': save and save['playerId'],
+			'savedBy': save,
+			'blockedById': block and block['playerId'],
+			'blockedBy': block,
+		}
+	elif event_type == 'Turnover':
+		steal = opponent if rnd.random() < 0.5 else None
+		event['turnover'] = {
+			'teamId': team_id,
+			'lostPossesionPlayer': player,
+			'type': rnd.choice(['Clock_Expired', 'Lost_Ball', 'Offensive_Foul', 'Ball_Under']),
+			'wonPossesionPlayerId': steal and steal['playerId'],
+			'wonPossesionPlayer': steal,
+		}
+	elif event_type == 'Exclusion':
+		fouled = opponent if rnd.random() < 0.7 else None
+		event['exclusion'] = {
+			'teamId': team_id,
+			'excludedPlayerId': player['playerId'],
+			'excludedPlayer': player,
+			'isPenaltyExclusion': rnd.random() < 0.2,
+			'isDoubleExclusion': False,
+			'locationX': round(rnd.uniform(0, 20), 2),
+			'locationY': round(rnd.uniform(0, 10), 2),
+			'fouledPlayerId': fouled and fouled['playerId'],
+			'fouledPlayer': fouled,
+		}
+	elif event_type == 'Card':
+		event['card'] = {
+			'type': rnd.choice(['Yellow', 'Red']),
+			'teamId': team_id,
+			'cardedPlayerId': None,
+			'cardedPlayer': None,
+		}
+	elif event_type == 'Timeout':
+		event['timeout'] = {'teamId': team_id}
+	elif event_type == 'Swim_Off':
+		home_swimmer = get_player(rnd, rosters, home_id)
+		away_swimmer = get_player(rnd, rosters, away_id)
+		event['swimoff'] = {
+			'homeTeamSwimmer': home_swimmer,
+			'awayTeamSwimmer': away_swimmer,
+			'winnerSwimmer': rnd.choice([home_swimmer, away_swimmer]),
+		}
+
+	return event
+
+
+def generate(directory, teams=12, events_per_period=(20, 35), seed=0, code=2124, league='LEN', start=2022):
+	rnd = random.Random(seed)
+
+	team_names = {1000 + i: f'Synthetic Club {chr(ord("A") + i)}' for i in range(teams)}
+	rosters = {team_id: get_roster(rnd, name, 100 * team_id) for team_id, name in team_names.items()}
+
+	competition_teams = [{
+		'teamId': team_id,
+		'team': {
+			'shortName': name.split()[-1],
+			'gender': 'Male',
+			'category': 'Senior',
+			'club': name,
+			'country': 'Synthetic',
+			'city': f'City {name.split()[-1]}',
+		},
+	} for team_id, name in team_names.items()]
+
+	matches = []
+	website_id = 10000
+	for round_number, (home_id, away_id) in enumerate(
+			(home_id, away_id) for home_id in team_names for away_id in team_names if home_id != away_id):
+		website_id += 1
+		events = []
+		event_id = website_id * 1000
+		for period in PERIODS:
+			for _ in range(rnd.randint(*events_per_period)):
+				event_id += 1
+				events.append(get_event(rnd, event_id, period, home_id, away_id, rosters))
+
+		home_score = sum(1 for e in events if e['type'] == 'Shot' and e['shot']['isGoal'] and e['shot']['teamId'] == home_id)
+		away_score = sum(1 for e in events if e['type'] == 'Shot' and e['shot']['isGoal'] and e['shot']['teamId'] == away_id)
+
+		matches.append({
+			'id': website_id,
+			'startDate': f'{start}-{10 + round_number // 60:02d}-{round_number % 28 + 1:02d}T18:30:00+01:00',
+			'number': str(round_number // (teams // 2) + 1),
+			'status': 'Finished',
+			'homeTeamGoalsTotal': home_score,
+			'awayTeamGoalsTotal': away_score,
+			'homeTeamDisplayName': team_names[home_id],
+			'awayTeamDisplayName': team_names[away_id],
+			'homeTeamId': home_id,
+			'awayTeamId': away_id,
+		})
+
+		save_payload(directory, 'Matches', website_id, {
+			'homeTeam': {'id': home_id, 'name': team_names[home_id]},
+			'awayTeam': {'id': away_id, 'name': team_names[away_id]},
+			'players': rosters[home_id] + rosters[away_id],
+		})
+		save_payload(directory, 'Events', website_id, events)
+
+	save_payload(directory, 'Competitions', code, {'matches': matches, 'competitionTeams': competition_teams})
+
+	with open(os.path.join(directory, 'corpus.json'), 'w', encoding='utf-8') as f:
+		json.dump({'league': league, 'start': start, 'end': start + 1, 'code': code, 'synthetic': True}, f)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Generate a synthetic corpus of arena API payloads')
+	parser.add_argument('-o', '--output', type=str, required=True, help='The directory where to write the corpus')
+	parser.add_argument('--teams', type=int, default=12, help='The number of teams, each pair plays twice. Default is 12')
+	parser.add_argument('--seed', type=int, default=0, help='The seed of the random generator, default is 0')
+	args = parser.parse_args()
+
+	generate(args.output, teams=args.teams, seed=args.seed)
+
+
+if __name__ == '__main__':
+	main()
@@ -1,5 +1,8 @@
 import argparse
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import sys
 from utils.constants import *
@@ -28,12 +31,12 @@ def get_writer(name, **kwargs):
 	if name == 'csv':
 		from writers.CSV.writer import Writer
 		writer = Writer(**kwargs)
-	# elif name == 'parquet' or name == 'pq':
-	# 	from writers.parquet.writer import Writer
-	# 	writer = Writer(**kwargs)
-	# elif name == 'sqlite3' or name == 'sqlite':
-	# 	from writers.SQLite3.writer import Writer
-	# 	writer = Writer(**kwargs)
+	elif name == 'parquet' or name == 'pq':
+		from writers.parquet.writer import Writer
+		writer = Writer(**kwargs)
+	elif name == 'sqlite3' or name == 'sqlite':
+		from writers.SQLite3.writer import Writer
+		writer = Writer(**kwargs)
 	else:
 		writer = None
 
@@ -56,6 +59,23 @@ def get_scraper(name, writer):
 	return scraper
 
 
+def download_season(league, season, kwargs, writer_name, kwargs_writer, auth_settings, arena_settings, loglevel):
+	# downloads a single season in a process of the pool. The process did not run main(), so the modules are configured
+	# here, and the metrics are handed back to the parent
+	from scrapers.general import arena, auth
+	from utils import metrics
+	logger.setLevel(level=loglevel)
+	auth.configure(**auth_settings)
+	arena.configure(**arena_settings)
+	metrics.reset()
+
+	writer = get_writer(writer_name, **kwargs_writer)
+	scraper = get_scraper(name=league, writer=writer)
+	scraper.download(**(kwargs | {'seasons': [season]}))
+
+	return metrics.get_metrics().to_dict()
+
+
 def main():
 	parser = argparse.ArgumentParser()
 
@@ -107,18 +127,83 @@ def main():
 	csv_dir_help = 'The directory where to store the csv or parquet files'
 	parser.add_argument('--dir', '--csv_dir', '--parquet_dir', type=str, default='data', help=csv_dir_help)
 
+	parquet_row_groups_help = 'Whether each row group of the parquet play-by-play contains a game or a whole season, default is game'
+	parser.add_argument('--parquet_row_groups', type=str, default='game', choices=['game', 'season'], help=parquet_row_groups_help)
+
 	csv_append_help = 'Whether to append the content to a previously existing file, or delete it and create it from scratch. The default behavior is to delete'
 	parser.add_argument('-a', '--append', default=False, help=csv_append_help, action='store_true')
 
+	incremental_help = 'Whether to download only the games that are new or whose status changed since the last run. It implies --append'
+	parser.add_argument('--incremental', default=False, help=incremental_help, action='store_true')
+
+	manifest_dir_help = 'The directory where to keep track of the games already downloaded in incremental mode, default is .manifests in the output directory'
+	parser.add_argument('--manifest_dir', type=str, help=manifest_dir_help)
+
 	boxscores_only_help = 'Whether to save only the boxscores, ignoring play-by-play logs. Default is false.'
 	parser.add_argument('--no_pbp', '--no_play-by-play', '--boxscores_only', '--boxscore_only', default=False,
 	                    help=boxscores_only_help, action='store_true')
 
 	parser.add_argument('--suppress_warnings', default=False, help='Suppress warnings on missing franchises or abbrevations', action='store_true')
 
-	low_bandwidth_help = 'Whether to use less internet. Default is false.'
+	low_bandwidth_help = 'Whether to use less internet: conditional requests for the cached responses, no roster request for the games whose players are already known and a single competition request per run. Default is false.'
 	parser.add_argument('-S', '--low_bandwidth', '--save', default=False, help=low_bandwidth_help, action='store_true')
 
+	live_help = 'Whether to follow the games in progress until they are over, writing their new actions every few seconds instead of downloading the games. It implies --append'
+	parser.add_argument('--live', default=False, help=live_help, action='store_true')
+
+	poll_interval_help = 'In live mode, the seconds between two polls of a game whose last poll brought new events, default is 5'
+	parser.add_argument('--poll_interval', type=float, default=5, help=poll_interval_help)
+
+	max_poll_interval_help = 'In live mode, the most seconds between two polls of a game, and between two refreshes of the calendar. Default is 60'
+	parser.add_argument('--max_poll_interval', type=float, default=60, help=max_poll_interval_help)
+
+	daemon_help = 'Whether to run forever, downloading every game when it should be over according to the calendars and sleeping in between. It implies --append'
+	parser.add_argument('--daemon', default=False, help=daemon_help, action='store_true')
+
+	game_duration_help = 'In daemon mode, the minutes from the start of a game to its download, default is 120'
+	parser.add_argument('--game_duration', type=float, default=120, help=game_duration_help)
+
+	retry_interval_help = 'In daemon mode, the minutes to wait before checking again a game that is not over when expected, default is 15'
+	parser.add_argument('--retry_interval', type=float, default=15, help=retry_interval_help)
+
+	max_retries_help = 'In daemon mode, how many times a game that is not over when expected is checked again, default is 8'
+	parser.add_argument('--max_retries', type=int, default=8, help=max_retries_help)
+
+	calendar_interval_help = 'In daemon mode, the minutes between two refreshes of the calendars, default is 360'
+	parser.add_argument('--calendar_interval', type=float, default=360, help=calendar_interval_help)
+
+	processes_help = 'The number of seasons to download in parallel, each in its own process, default is 1'
+	parser.add_argument('--processes', type=int, default=1, help=processes_help)
+
+	workers_help = 'The number of games to download and parse concurrently, default is 1'
+	parser.add_argument('--workers', type=int, default=1, help=workers_help)
+
+	max_connections_help = 'The maximum number of open connections to the arena API, default is 8'
+	parser.add_argument('--max_connections', type=int, default=8, help=max_connections_help)
+
+	rate_limit_help = 'The maximum number of requests per second to the arena API, shared by all the processes and lowered automatically when the API throttles us. Default is 20'
+	parser.add_argument('--rate_limit', type=float, default=20, help=rate_limit_help)
+
+	cache_dir_help = 'The directory where to cache the responses of the arena API, default is \'cache\''
+	parser.add_argument('--cache_dir', type=str, default='cache', help=cache_dir_help)
+
+	parser.add_argument('--no_cache', default=False, help='Do not read nor write the responses cache', action='store_true')
+
+	token_file_help = 'The file where to keep the authorization token of the arena API, default is token.json in the cache directory'
+	parser.add_argument('--token_file', type=str, help=token_file_help)
+
+	api_url_help = 'The base url of the arena API, such as the one of benchmarks/server.py. Default is the real API'
+	parser.add_argument('--api_url', type=str, help=api_url_help)
+
+	api_token_help = 'The authorization token to send to the arena API, instead of getting one from total-waterpolo.com'
+	parser.add_argument('--api_token', type=str, help=api_token_help)
+
+	competitions_ttl_help = 'For how many seconds a cached competition calendar is valid, default is 600'
+	parser.add_argument('--competitions_ttl', type=int, default=600, help=competitions_ttl_help)
+
+	metrics_out_help = 'Where to write the metrics of the run, as path.json and as the Prometheus textfile path.prom'
+	parser.add_argument('--metrics_out', '--metrics-out', type=str, help=metrics_out_help)
+
 	csv_decimal_separator_help = 'The separator of decimal numbers in csv files, default is \'.\''
 	parser.add_argument('--csv_decimal_separator', type=str, default='.', help=csv_decimal_separator_help)
 
@@ -212,30 +297,164 @@ def main():
 		'tg': args.tg,
 		'tg_config': tg_config,
 		'suppress_warnings': args.suppress_warnings,
+		'workers': args.workers,
+		'incremental': args.incremental,
+		'manifest_dir': args.manifest_dir if args.manifest_dir else os.path.join(args.dir, '.manifests'),
+		'poll_interval': args.poll_interval,
+		'max_poll_interval': args.max_poll_interval,
 	}
 
 	kwargs_writer = {
 		'config_file': args.mysql_config,
 		'dir': args.dir,
-		'append': bool(args.append),
+		'append': bool(args.append) or args.incremental or args.live or args.daemon,
 		'csv_file_separator': args.csv_file_separator,
 		'csv_decimal_separator': args.csv_decimal_separator,
 		'sqlite_db': args.sqlite3_db,
+		'parquet_row_groups': args.parquet_row_groups,
 	}
 
+	from scrapers.general import arena, auth
+	from utils import metrics
+	auth_settings = {
+		'token_file': args.token_file if args.token_file else os.path.join(args.cache_dir, 'token.json'),
+		'source': auth.StaticTokenSource(args.api_token) if args.api_token else None,
+	}
+	arena_settings = {
+		'api_url': args.api_url,
+		'max_connections': args.max_connections,
+		'rate_limit': args.rate_limit,
+		'cache_dir': None if args.no_cache else args.cache_dir,
+		'competitions_ttl': args.competitions_ttl,
+		'low_bandwidth': args.low_bandwidth,
+	}
+	auth.configure(**auth_settings)
+	arena.configure(**arena_settings)
+
 	writer = get_writer(args.writer, **kwargs_writer)
 	if writer is None:
-		logger.error(f'Writer {args.writer} is not within allowed values [mysql, csv, sqlite3]. Closing.')
+		logger.error(f'Writer {args.writer} is not within allowed values [csv, parquet, sqlite3]. Closing.')
 		exit(UNSUPPORTED_WRITER)
 
-	for league in args.leagues:
-		scraper = get_scraper(name=league, writer=writer)
-
-		if scraper is None:
-			logger.error(f'League {league} is not within allowed values. Currently, supported leagues are\n{leagues_str}')
-			continue
-
-		scraper.download(**kwargs)
+	processes = max(1, args.processes)
+	if processes > 1 and args.writer.lower() in ('sqlite3', 'sqlite'):
+		logger.warning('The SQLite3 database cannot be written by several processes at once, using a single process')
+		processes = 1
+	if processes > 1 and (args.live or args.daemon):
+		logger.warning('The games in progress and the daemon mode are followed by a single process')
+		processes = 1
+
+	failed = []
+
+	if args.daemon:
+		from scrapers.scheduler import Scheduler
+		scrapers = []
+		for league in args.leagues:
+			scraper = get_scraper(name=league, writer=writer)
+
+			if scraper is None:
+				logger.error(f'League {league} is not within allowed values. Currently, supported leagues are\n{leagues_str}')
+				continue
+
+			scrapers.append(scraper)
+
+		def on_download():
+			# the metrics of a run that never ends are written after every download
+			if args.metrics_out:
+				metrics.get_metrics().write(args.metrics_out)
+
+		scheduler = Scheduler(scrapers, game_duration=args.game_duration * 60, retry_interval=args.retry_interval * 60,
+		                      max_retries=args.max_retries, calendar_interval=args.calendar_interval * 60,
+		                      on_download=on_download, **kwargs)
+		scheduler.run()
+	elif args.live:
+		if args.no_pbp:
+			logger.warning('Live mode follows the play-by-play of the games, --no_pbp is ignored')
+
+		from scrapers.live import LivePoller
+		scrapers = []
+		for league in args.leagues:
+			scraper = get_scraper(name=league, writer=writer)
+
+			if scraper is None:
+				logger.error(f'League {league} is not within allowed values. Currently, supported leagues are\n{leagues_str}')
+				continue
+
+			scrapers.append(scraper)
+
+		# the games of all the leagues are followed at once
+		LivePoller(scrapers, **kwargs).run()
+	elif processes == 1:
+		for league in args.leagues:
+			scraper = get_scraper(name=league, writer=writer)
+
+			if scraper is None:
+				logger.error(f'League {league} is not within allowed values. Currently, supported leagues are\n{leagues_str}')
+				continue
+
+			scraper.download(**kwargs)
+	else:
+		# every (league, season) writes to its own directory, so they can be downloaded by independent processes
+		units = []
+		for league in args.leagues:
+			scraper = get_scraper(name=league, writer=None)
+
+			if scraper is None:
+				logger.error(f'League {league} is not within allowed values. Currently, supported leagues are\n{leagues_str}')
+				continue
+
+			for season in scraper.get_seasons(**kwargs):
+				units.append((league, f'{season["start"]}-{season["end"]}'))
+
+		if args.api_token is None:
+			# the token is fetched once here and saved to the token file, where every process finds it
+			auth.get_broker().get_token()
+
+		# the rate limit is for the whole run, so each process gets its share
+		arena_settings['rate_limit'] = args.rate_limit / min(processes, max(1, len(units)))
+
+		# spawned processes do not inherit the event loop thread of the arena client
+		context = multiprocessing.get_context('spawn')
+		with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+			futures = {executor.submit(download_season, league, season, kwargs, args.writer, kwargs_writer, auth_settings,
+			                           arena_settings, args.loglevel): (league, season) for league, season in units}
+
+			for future in as_completed(futures):
+				league, season = futures[future]
+				try:
+					metrics.get_metrics().merge(future.result())
+				except Exception:
+					logger.exception(f'Could not download the {season} season of {league}')
+					failed.append(f'{league} {season}')
+
+	registry = metrics.get_metrics()
+	if not args.no_cache:
+		hits = registry.get_counter('cache_requests_total', result='hit')
+		misses = registry.get_counter('cache_requests_total', result='miss')
+		print(f'HTTP cache: {hits} hits, {misses} misses')
+
+	if args.metrics_out:
+		registry.write(args.metrics_out)
+
+	if args.low_bandwidth:
+		received = registry.get_counter('wire_bytes_total')
+		compression = registry.get_counter('response_bytes_total') - received
+		not_modified = registry.get_counter('saved_bytes_total', reason='not_modified')
+		skipped = registry.get_counter('skipped_requests_total')
+		print(f'Low bandwidth: received {received / 1e6:.2f} MB, saved {compression / 1e6:.2f} MB by compression and '
+		      f'{not_modified / 1e6:.2f} MB by conditional requests, skipped {skipped} requests')
+
+	throttled = registry.get_counter('requests_total', status='429') + registry.get_counter('requests_total', status='503')
+	if throttled and processes == 1:
+		limiter_state = arena.get_rate_limiter_state()
+		print(f'Throttled {throttled} times by the arena API, ended at {limiter_state["rate"]:.1f} requests/s '
+		      f'and {limiter_state["concurrency"]} connections')
+	elif throttled:
+		print(f'Throttled {throttled} times by the arena API')
+
+	if failed:
+		logger.error(f'Could not download {", ".join(failed)}')
+		exit(FAILED_SEASONS)
 
 	exit(0)
 
@@ -1,20 +1,14 @@
-import json
+import copy
 import logging
-from abc import ABC, abstractmethod
+from abc import ABC
 from datetime import datetime
 from unidecode import unidecode
-from utils import utils
+from utils import metrics, utils
+from utils.batch import ActionBatch, RAW_ACTION_SCHEMA
 from utils.constants import *
-import pandas as pd
 from writers.writer import Writer
-from selenium.common.exceptions import SessionNotCreatedException, StaleElementReferenceException, TimeoutException
-from selenium.webdriver.firefox.service import Service
-import re
-from seleniumwire import webdriver
-from selenium.webdriver.firefox.options import Options
-from webdriver_manager.firefox import GeckoDriverManager
-import requests
-from scrapers.scraper import Scraper as AbstractScraper
+from scrapers.general import arena, decoders
+from scrapers.scraper import Scraper as AbstractScraper, GameContext, LiveGame
 logger = logging.getLogger('waterpolo')
 
 headers = {
@@ -39,31 +33,7 @@ class Scraper(AbstractScraper, ABC):
 	def __init__(self, writer: Writer, season_mapping):
 		super().__init__(writer)
 		self.season_mapping = season_mapping
-		self.authorization = ''
-
-		url = 'https://total-waterpolo.com/tw_match/4432'
-		exe = GeckoDriverManager().install()
-		options = Options()
-		options.add_argument('-headless')  # os.environ['WDM_LOG'] = str(logging.NOTSET)
-		try:
-			driver = webdriver.Firefox(service=Service(exe), options=options)
-		except SessionNotCreatedException:
-			exe = GeckoDriverManager(version="v0.31.0").install()
-			driver = webdriver.Firefox(service=Service(exe), options=options)
-
-		while self.authorization == '':
-			driver.get(url)
-
-			for request in driver.requests:
-				# print(request.headers.keys())
-				if 'Authorization' in request.headers:
-					self.authorization = request.headers['Authorization']
-					break
-		driver.quit()
-
-		# print('AUTH:', self.authorization)
-
-		headers['Authorization'] = self.authorization
+		self.client = arena.get_client(headers)
 
 	def get_seasons(self, **kwargs):
 		first_year = 2022
@@ -88,14 +58,17 @@ class Scraper(AbstractScraper, ABC):
 
 			season['players'] = dict()
 			season['teams'] = dict()
+			season['rosters'] = dict()
+			season['team_names'] = dict()
 			seasons.append(season)
 
 		return seasons
 
 	def get_games(self, **kwargs):
-		url = f'https://arena.total-waterpolo.com/api/Competitions/{self.current_season["code"]}?{{}}='
+		if kwargs.get('types') or kwargs.get('phases'):
+			logger.warning('The arena API does not tell the type nor the phase of the games, --types and --phases are ignored')
 
-		response = requests.get(url, headers=headers).json()
+		response = self.client.run(self.client.get_competition(self.current_season['code'], refresh=kwargs.get('refresh', False)))
 
 		matches = response['matches']
 		games = []
@@ -108,6 +81,11 @@ class Scraper(AbstractScraper, ABC):
 				date_str = date_str.split('.')[0]
 
 			game_date = datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%S')
+			# the date above is in the local time of the game, this one is absolute when the offset is known
+			if '+' in match['startDate']:
+				start_time = datetime.fromisoformat(f'{date_str}+{match["startDate"].split("+")[1]}')
+			else:
+				start_time = game_date
 
 			try:
 				game_round = int(match['number'])
@@ -119,8 +97,9 @@ class Scraper(AbstractScraper, ABC):
 			elif match['status'] == 'Not_Started':
 				status = SCHEDULED
 			else:
-				logger.warning(f'Could not recognize game status "{match["status"]}"')
-				status = None
+				# the API has several statuses for the parts of a game in progress
+				logger.debug(f'Game status "{match["status"]}" is considered live')
+				status = LIVE
 
 			home_score = match['homeTeamGoalsTotal']
 			away_score = match['awayTeamGoalsTotal']
@@ -139,6 +118,32 @@ class Scraper(AbstractScraper, ABC):
 				away_id: away_team
 			}
 
+			game = {
+				'game_id': None,
+				'edition_id': None,
+				'date': game_date,
+				'start_time': start_time,
+				# 'type': game_type,
+				# 'phase': phase,
+				'round': game_round,
+				'status': status,
+				'home_team_id': None,
+				'away_team_id': None,
+				'home_score': home_score,
+				'away_score': away_score,
+				'number_of_overtimes': None,
+				'website_id': website_id,
+				'game_url': game_url,
+				'home_team': home_team,
+				'away_team': away_team,
+				'home_team_website_id': home_id,
+				'away_team_website_id': away_id,
+			}
+
+			# the filters of run.py are applied before any work on the game and its teams
+			if not self.is_game_selected(game, **kwargs):
+				continue
+
 			for team_id in team_map:
 				if team_map[team_id] not in self.current_season['teams']:
 					# print(team_id)
@@ -160,26 +165,6 @@ class Scraper(AbstractScraper, ABC):
 
 					if team_map[team_id] not in self.current_season['teams']:
 						self.current_season['teams'][team_map[team_id]] = dict()
-			# print(team_id)
-			game = {
-				'game_id': None,
-				'edition_id': None,
-				'date': game_date,
-				# 'type': game_type,
-				# 'phase': phase,
-				'round': game_round,
-				'status': status,
-				'home_team_id': None,
-				'away_team_id': None,
-				'home_score': home_score,
-				'away_score': away_score,
-				'number_of_overtimes': None,
-				'website_id': website_id,
-				'game_url': game_url,
-				'home_team': home_team,
-				'away_team': away_team,
-			}
-
 			games.append(game)
 
 		return games
@@ -262,24 +247,182 @@ class Scraper(AbstractScraper, ABC):
 
 		return franchise
 
-	def download_actions(self):
-		game = self.current_game
+	def submit_actions(self, executor, context: GameContext):
+		# the game is downloaded on the client's event loop, so the executor's threads are not needed
+		return self.client.submit(self.fetch_actions(context))
 
-		info_url = f'https://arena.total-waterpolo.com/api/Matches/{game["website_id"]}?{{}}='
-		info_response = requests.get(info_url, headers=headers).json()
-		teams_map = {
-			info_response['homeTeam']['id']: info_response['homeTeam']['name'],
-			info_response['awayTeam']['id']: info_response['awayTeam']['name'],
-		}
+	async def fetch_actions(self, context: GameContext):
+		website_id = context.game['website_id']
+		finished = context.game['status'] == PLAYED
+
+		if self.client.low_bandwidth:
+			# the Matches payload is only needed for the players and teams not seen yet in the season
+			with metrics.timer('fetch'):
+				response = await self.client.get_events(website_id, finished=finished)
+
+			with metrics.timer('decode'):
+				actions = self.parse_events(context, response)
+			if actions is not None:
+				metrics.count('skipped_requests_total', route='Matches')
+				return actions
 
-		# print(teams_map)
+			with metrics.timer('fetch'):
+				info_response = await self.client.get_match(website_id, finished=finished)
+		else:
+			with metrics.timer('fetch'):
+				info_response, response = await self.client.get_match_and_events(website_id, finished=finished)
+
+		with metrics.timer('decode'):
+			return self.parse_actions(context, info_response, response)
+
+	def download_actions(self, context: GameContext):
+		return self.client.run(self.fetch_actions(context))
+
+	def submit_live_actions(self, executor, live: LiveGame):
+		return self.client.submit(self.fetch_live_actions(live))
+
+	async def fetch_live_actions(self, live: LiveGame):
+		# the actions of the events that came since the last poll of the game. The Matches payload is requested at the
+		# first poll, and again only if a new event has a player who was not in the roster yet
+		context = live.context
+		website_id = context.game['website_id']
+		finished = context.game['status'] == PLAYED
+
+		with metrics.timer('fetch'):
+			if live.decoding_state is None:
+				info_response, response = await self.client.get_match_and_events(website_id, finished=finished)
+			else:
+				info_response = None
+				response = await self.client.get_events(website_id, finished=finished)
 
-		players_map = {}
+		with metrics.timer('decode'):
+			if info_response is not None:
+				self.update_live_roster(live, info_response)
 
-		for player_raw in info_response['players']:
+			events = self.get_new_events(live, response)
+			try:
+				# with a roster just downloaded, there is no newer one to wait for
+				actions = self.decode_live_events(live, events, skip=info_response is not None)
+			except KeyError:
+				actions = None
+
+		if actions is None:
+			with metrics.timer('fetch'):
+				info_response = await self.client.get_match(website_id, finished=finished)
+
+			with metrics.timer('decode'):
+				self.update_live_roster(live, info_response)
+				actions = self.decode_live_events(live, events, skip=True)
+
+		if events:
+			live.last_event_id = events[-1]['id']
+			live.event_ids.update(event['id'] for event in events)
+
+		return actions
+
+	def decode_live_events(self, live: LiveGame, events, skip=False):
+		# the events are decoded on a copy of the game's decoding state, which replaces it only once they all are, so that
+		# a failure does not leave the score of a part of them behind. With skip, the events that cannot be decoded (e.g.
+		# with a player missing from the roster) are left out, so that the game does not stall on them
+		state = copy.copy(live.decoding_state)
+		actions = ActionBatch(RAW_ACTION_SCHEMA)
+
+		if not skip:
+			decoders.decode_events(events, state, actions)
+		else:
+			for event in events:
+				score = (state.home_score, state.away_score)
+				event_actions = ActionBatch(RAW_ACTION_SCHEMA)
+
+				try:
+					decoders.decode_events([event], state, event_actions)
+				except KeyError as e:
+					state.home_score, state.away_score = score
+					logger.warning(f'Could not decode event {event["id"]} of game {live.context.game["website_id"]}, missing {e}, '
+					               f'skipping it')
+					continue
+
+				for row in event_actions.rows():
+					actions.append(*row)
+
+		live.decoding_state = state
+		return actions
+
+	def download_live_actions(self, live: LiveGame):
+		return self.client.run(self.fetch_live_actions(live))
+
+	def update_live_roster(self, live: LiveGame, info_response):
+		teams_map, players = self.parse_match(live.context, info_response)
+		players_map = {player_id: full_name for player_id, full_name, _ in players}
+
+		if live.decoding_state is None:
+			live.decoding_state = decoders.DecodingState(live.context.game, teams_map, players_map)
+		else:
+			live.decoding_state.players_map = players_map
+
+	def get_new_events(self, live: LiveGame, response):
+		# the events are in chronological order, so the new ones usually follow the last event seen
+		if live.last_event_id is None:
+			return response
+
+		for i in range(len(response) - 1, -1, -1):
+			if response[i]['id'] == live.last_event_id:
+				return response[i + 1:]
+
+		logger.warning(f'The last event seen of game {live.context.game["website_id"]} is gone, looking for the new events by id')
+		return [event for event in response if event['id'] not in live.event_ids]
+
+	def submit_boxscores(self, executor, context: GameContext):
+		return self.client.submit(self.fetch_boxscores(context))
+
+	async def fetch_boxscores(self, context: GameContext):
+		# the box scores are made of the Matches payload and of the scores of the Competitions listing, so the events are
+		# never requested
+		with metrics.timer('fetch'):
+			info_response = await self.client.get_match(context.game['website_id'], finished=context.game['status'] == PLAYED)
+
+		with metrics.timer('decode'):
+			_, players = self.parse_match(context, info_response)
+
+		return players
+
+	def download_boxscores(self, context: GameContext):
+		return self.client.run(self.fetch_boxscores(context))
+
+	def get_roster(self, context: GameContext, players_raw):
+		# rosters rarely change between the games of a season, so each team's roster is parsed only the first time it
+		# appears with the same players, numbers and details
+		rosters = context.season.setdefault('rosters', dict())
+
+		teams_players = dict()
+		for player_raw in players_raw:
+			teams_players.setdefault(player_raw['team']['name'], []).append(player_raw)
+
+		roster = []
+		for team, team_players in teams_players.items():
+			fingerprint = (team, tuple((player_raw['playerId'], player_raw['number'], player_raw['position'], player_raw['player']['name'],
+			                            player_raw['player']['surname'], player_raw['player']['height'], player_raw['player']['weight'],
+			                            player_raw['player']['dominantHand']) for player_raw in team_players))
+
+			if fingerprint in rosters:
+				metrics.count('roster_cache_total', result='hit')
+			else:
+				metrics.count('roster_cache_total', result='miss')
+				rosters[fingerprint] = self.parse_roster(team_players)
+
+			# the player and contract are completed by the scraper and the writers, so every game gets its own copy
+			roster.extend((player_id, full_name, dict(player), dict(contract)) for player_id, full_name, player, contract in rosters[fingerprint])
+
+		return roster
+
+	def parse_roster(self, players_raw):
+		roster = []
+
+		names = self.clean_names([player_raw['player']['name'] for player_raw in players_raw])
+		surnames = self.clean_names([player_raw['player']['surname'] for player_raw in players_raw])
+
+		for player_raw, name, surname in zip(players_raw, names, surnames):
 			player_id = player_raw['playerId']
-			name = self.clean_name(player_raw['player']['name'])
-			surname = self.clean_name(player_raw['player']['surname'])
 			full_name = f'{name} {surname}'
 			if player_raw['player']['height'] is not None:
 				height = utils.parse_int(player_raw['player']['height'].split()[0], None)
@@ -312,403 +455,75 @@ class Scraper(AbstractScraper, ABC):
 				'picture_url': None,
 			}
 
-			players_map[player_id] = full_name
-
-			self.current_season['players'][player_id] = (player, contract)
+			roster.append((player_id, full_name, player, contract))
 
-		# print(players_map)
+		return roster
 
-		url = f'https://arena.total-waterpolo.com/api/Events/{game["website_id"]}?{{}}='
+	def parse_events(self, context: GameContext, response):
+		# decodes the events with the teams and players already seen in the season, or returns None if one of them was
+		# not seen yet
+		game = context.game
+		team_names = context.season.setdefault('team_names', dict())
 
-		response = requests.get(url, headers=headers).json()
+		home_id = game['home_team_website_id']
+		away_id = game['away_team_website_id']
+		if home_id not in team_names or away_id not in team_names:
+			return None
 
-		actions = []
+		teams_map = {
+			home_id: team_names[home_id],
+			away_id: team_names[away_id],
+		}
+		players_map = {player_id: player['full_name'] for player_id, (player, _) in context.season['players'].items()}
 
-		home_score, away_score = 0, 0
+		actions = ActionBatch(RAW_ACTION_SCHEMA)
+		state = decoders.DecodingState(game, teams_map, players_map)
 
-		for entry in response:
+		try:
+			decoders.decode_events(response, state, actions)
+		except KeyError:
+			return None
 
-			if entry['period'] == 'First_Period':
-				period = 1
-			elif entry['period'] == 'Second_Period':
-				period = 2
-			elif entry['period'] == 'Third_Period':
-				period = 3
-			elif entry['period'] == 'Fourth_Period':
-				period = 4
-			elif entry['period'] == 'Overtime':
-				period = 5
-			else:
-				logger.warning(f'Could not recognize period "{entry["period"]}"')
-				continue
+		# a player who changed team since the last time they were seen needs the contract of this game
+		players = context.season['players']
+		for team, player_id in zip(actions['team'], actions['player_id']):
+			if player_id is not None and players[player_id][1]['team'] != team:
+				return None
 
-			remaining_period_time = 60 * entry['minute'] + entry['seconds']
-
-			action_id = entry['id']
-
-			if entry['type'] == 'Turnover':
-				description = TURNOVER
-				team = teams_map[entry['turnover']['teamId']]
-				player = players_map[entry['turnover']['lostPossesionPlayer']['playerId']]
-
-				flags = map_action_flag(entry['turnover']['type'])
-
-				action = {
-					'action_id': action_id,
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': player,
-					'player_id': entry['turnover']['lostPossesionPlayer']['playerId'],
-					'description': description,
-					'flags': flags,
-					'x': None,
-					'y': None,
-				}
-
-				actions.append(action)
-
-				if entry['turnover']['wonPossesionPlayerId'] is not None:
-					player_steal = players_map[entry['turnover']['wonPossesionPlayer']['playerId']]
-					team_steal = teams_map[entry['turnover']['wonPossesionPlayer']['teamId']]
-
-					action = {
-						'action_id': f'{action_id}-STL',
-						'period': period,
-						'remaining_period_time': remaining_period_time,
-						'team': team_steal,
-						'home_score': home_score,
-						'away_score': away_score,
-						'player': player_steal,
-						'player_id': entry['turnover']['wonPossesionPlayer']['playerId'],
-						'description': STEAL,
-						'flags': {},
-						'x': None,
-						'y': None,
-					}
-
-					actions.append(action)
-
-			elif entry['type'] == 'Card':
-
-				if entry['card']['type'] == 'Yellow':
-					description = YELLOW_CARD
-				elif entry['card']['type'] == 'Red':
-					description = RED_CARD
-				else:
-					logger.warning(f'Could not recognize card "{entry["card"]["type"]}"')
-					continue
+		for player_id in set(actions['player_id']):
+			if player_id is not None:
+				player, contract = players[player_id]
+				context.players[player_id] = (dict(player), dict(contract))
 
-				team = teams_map[entry['card']['teamId']]
-				if entry['card']['cardedPlayerId'] is not None:
-					player = players_map[entry['card']['cardedPlayer']['playerId']]
-					player_id = entry['card']['cardedPlayer']['playerId']
-				else:
-					player = None
-					player_id = None
-
-				action = {
-					'action_id': action_id,
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': player,
-					'player_id': player_id,
-					'description': description,
-					'flags': {},
-					'x': None,
-					'y': None,
-				}
-
-				actions.append(action)
-
-			elif entry['type'] == 'Timeout':
-				description = TURNOVER
-				team = teams_map[entry['timeout']['teamId']]
-
-				flags = {}
-
-				action = {
-					'action_id': action_id,
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': None,
-					'player_id': None,
-					'description': description,
-					'flags': flags,
-					'x': None,
-					'y': None,
-				}
-
-				actions.append(action)
-
-			elif entry['type'] == 'Swim_Off':
-				home_player_id = entry['swimoff']['homeTeamSwimmer']['playerId']
-				away_player_id = entry['swimoff']['awayTeamSwimmer']['playerId']
-
-				if entry['swimoff']['winnerSwimmer'] is None:
-					continue
-				if home_player_id == entry['swimoff']['winnerSwimmer']['playerId']:
-					winning_player = players_map[home_player_id]
-					winning_player_id = home_player_id
-					winning_team = game['home_team']
-
-					losing_player = players_map[away_player_id]
-					losing_player_id = away_player_id
-					losing_team = game['away_team']
-				else:
-					winning_player = players_map[away_player_id]
-					winning_player_id = away_player_id
-					winning_team = game['away_team']
-
-					losing_player = players_map[home_player_id]
-					losing_player_id = home_player_id
-					losing_team = game['home_team']
-
-				action = {
-					'action_id': action_id,
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': winning_team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': winning_player,
-					'player_id': winning_player_id,
-					'description': SWIM_OFF_WON,
-					'flags': {},
-					'x': None,
-					'y': None,
-				}
-
-				actions.append(action)
-
-				action = {
-					'action_id': f'{action_id}-SOL',
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': losing_team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': losing_player,
-					'player_id': losing_player_id,
-					'description': SWIM_OFF_LOST,
-					'flags': {},
-					'x': None,
-					'y': None,
-				}
-
-				actions.append(action)
-
-			elif entry['type'] == 'Exclusion':
-				description = EXCLUSION
-				team = teams_map[entry['exclusion']['teamId']]
-				if entry['exclusion']['excludedPlayerId'] is not None:
-					player = players_map[entry['exclusion']['excludedPlayer']['playerId']]
-					player_id = entry['exclusion']['excludedPlayer']['playerId']
-				else:
-					player = None
-					player_id = None
-
-				flags = set()
-				if entry['exclusion']['isPenaltyExclusion']:
-					flags.add(PENALTY_FOUL)
-				if entry['exclusion']['isDoubleExclusion']:
-					flags.add(DOUBLE_EXCLUSION)
-
-				action = {
-					'action_id': action_id,
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': player,
-					'player_id': player_id,
-					'description': description,
-					'flags': flags,
-					'x': entry['exclusion']['locationX'],
-					'y': entry['exclusion']['locationY'],
-				}
-
-				actions.append(action)
-
-				if entry['exclusion']['fouledPlayerId'] is not None:
-					player_drawn = players_map[entry['exclusion']['fouledPlayer']['playerId']]
-					team_drawn = teams_map[entry['exclusion']['fouledPlayer']['teamId']]
-
-					action = {
-						'action_id': f'{action_id}-FD',
-						'period': period,
-						'remaining_period_time': remaining_period_time,
-						'team': team_drawn,
-						'home_score': home_score,
-						'away_score': away_score,
-						'player': player_drawn,
-						'player_id': entry['exclusion']['fouledPlayer']['playerId'],
-						'description': FOUL_DRAWN,
-						'flags': flags,
-						'x': entry['exclusion']['locationX'],
-						'y': entry['exclusion']['locationY'],
-					}
-
-					actions.append(action)
-
-			elif entry['type'] == 'Shot':
-				if entry['shot']['isGoal']:
-					description = GOAL
-				else:
-					description = MISS
-
-				team = teams_map[entry['shot']['teamId']]
-
-				if description == GOAL and team == game['home_team']:
-					home_score += 1
-				elif description == GOAL and team == game['away_team']:
-					away_score += 1
-
-				player = players_map[entry['shot']['takenBy']['playerId']]
-
-				flags = map_action_flag(entry['shot']['type'])
-
-				action = {
-					'action_id': action_id,
-					'period': period,
-					'remaining_period_time': remaining_period_time,
-					'team': team,
-					'home_score': home_score,
-					'away_score': away_score,
-					'player': player,
-					'player_id': entry['shot']['takenBy']['playerId'],
-					'description': description,
-					'flags': flags,
-					'x': entry['shot']['locationX'],
-					'y': entry['shot']['locationY'],
-					'target_x': entry['shot']['targetX'],
-					'target_y': entry['shot']['targetY'],
-				}
-
-				actions.append(action)
-
-				if entry['shot']['blockedById'] is not None:
-					player_block = players_map[entry['shot']['blockedBy']['playerId']]
-					team_block = teams_map[entry['shot']['blockedBy']['teamId']]
-
-					action = {
-						'action_id': f'{action_id}-BLK',
-						'period': period,
-						'remaining_period_time': remaining_period_time,
-						'team': team_block,
-						'home_score': home_score,
-						'away_score': away_score,
-						'player': player_block,
-						'player_id': entry['shot']['blockedBy']['playerId'],
-						'description': BLOCK,
-						'flags': flags,
-						'x': entry['shot']['locationX'],
-						'y': entry['shot']['locationY'],
-						'target_x': entry['shot']['targetX'],
-						'target_y': entry['shot']['targetY'],
-					}
-
-					actions.append(action)
-
-					# action = {
-					# 	'action_id': f'{action_id}-BLKA',
-					# 	'period': period,
-					# 	'remaining_period_time': remaining_period_time,
-					# 	'team': team,
-					# 	'home_score': home_score,
-					# 	'away_score': away_score,
-					# 	'player': player,
-					# 	'player_id': entry['shot']['takenBy']['playerId'],
-					# 	'description': BLOCK_AGAINST,
-					# 	'flags': flags,
-					# 	'x': entry['shot']['locationX'],
-					# 	'y': entry['shot']['locationY'],
-					# 	'target_x': entry['shot']['locationX'],
-					# 	'target_y': entry['shot']['locationY'],
-					# }
-					#
-					# actions.append(action)
-
-				if entry['shot']['assistedById'] is not None:
-					player_ast = players_map[entry['shot']['assistedBy']['playerId']]
-					team_ast = teams_map[entry['shot']['assistedBy']['teamId']]
-
-					action = {
-						'action_id': f'{action_id}-AST',
-						'period': period,
-						'remaining_period_time': remaining_period_time,
-						'team': team_ast,
-						'home_score': home_score,
-						'away_score': away_score,
-						'player': player_ast,
-						'player_id': entry['shot']['assistedBy']['playerId'],
-						'description': ASSIST,
-						'flags': flags,
-						'x': entry['shot']['locationX'],
-						'y': entry['shot']['locationY'],
-						'target_x': entry['shot']['targetX'],
-						'target_y': entry['shot']['targetY'],
-					}
-
-					actions.append(action)
-
-				if entry['shot']['savedById'] is not None:
-					player_save = players_map[entry['shot']['savedBy']['playerId']]
-					team_save = teams_map[entry['shot']['savedBy']['teamId']]
-
-					action = {
-						'action_id': f'{action_id}-SAVE',
-						'period': period,
-						'remaining_period_time': remaining_period_time,
-						'team': team_save,
-						'home_score': home_score,
-						'away_score': away_score,
-						'player': player_save,
-						'player_id': entry['shot']['savedBy']['playerId'],
-						'description': SAVE,
-						'flags': flags,
-						'x': entry['shot']['locationX'],
-						'y': entry['shot']['locationY'],
-						'target_x': entry['shot']['targetX'],
-						'target_y': entry['shot']['targetY'],
-					}
-
-					actions.append(action)
-
-			elif entry['type'] is None:
-				continue
-			else:
-				logger.warning(f'Could not recognize action type "{entry["type"]}", ignoring action')
-				print(entry)
-				continue
 		return actions
 
+	def parse_match(self, context: GameContext, info_response):
+		# the teams and the players of a Matches payload, which are the game's roster and are kept in the season for the
+		# games whose Matches payload is not requested
+		teams_map = {
+			info_response['homeTeam']['id']: info_response['homeTeam']['name'],
+			info_response['awayTeam']['id']: info_response['awayTeam']['name'],
+		}
 
-def map_action_flag(flag):
-	mapping = {
-		'Clock_Expired': {CLOCK},
-		'Lost_Ball': {LOST},
-		'Power_Play': {LOST},
-		'Penalty': {PENALTY},
-		'Regular_Attack': None,
-		'Offensive_Foul': {OFFENSIVE_FOUL},
-		'Ball_Under': {BALL_UNDER},
-	}
-
-	if flag in mapping:
-		if mapping[flag] is None:
-			return {}
-		else:
-			return mapping[flag]
-	else:
-		logger.warning(f'Could not recognize action flag "{flag}"')
-		return {}
\ No newline at end of file
+		context.season.setdefault('team_names', dict()).update(teams_map)
+
+		players = []
+
+		for player_id, full_name, player, contract in self.get_roster(context, info_response['players']):
+			players.append((player_id, full_name, contract['team']))
+
+			context.players[player_id] = (player, contract)
+			context.season['players'][player_id] = (player, contract)
+
+		return teams_map, players
+
+	def parse_actions(self, context: GameContext, info_response, response):
+		game = context.game
+
+		teams_map, players = self.parse_match(context, info_response)
+		players_map = {player_id: full_name for player_id, full_name, _ in players}
+
+		actions = ActionBatch(RAW_ACTION_SCHEMA)
+		state = decoders.DecodingState(game, teams_map, players_map)
+
+		return decoders.decode_events(response, state, actions)
@@ -0,0 +1,241 @@
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from scrapers.general import auth
+from scrapers.general.auth import TokenBroker
+from utils import http, metrics
+from utils.cache import ResponseCache
+from utils.ratelimit import RateLimiter, get_retry_after
+logger = logging.getLogger('waterpolo')
+
+API_URL = 'https://arena.total-waterpolo.com/api'
+
+settings = {
+	'api_url': API_URL,
+	'max_connections': 8,
+	'rate_limit': 20.0,
+	'max_attempts': http.MAX_ATTEMPTS,
+	'cache_dir': None,
+	'competitions_ttl': 600,
+	'low_bandwidth': False,
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class ArenaError(Exception):
+	pass
+
+
+class ArenaClient:
+	# all the requests to the arena API go through one aiohttp session, whose keep-alive connections are shared by every
+	# scraper. The session lives on an event loop running in a background thread, so that synchronous code can submit
+	# coroutines and wait for them (or collect them later as concurrent futures)
+	def __init__(self, headers, broker: TokenBroker, api_url=API_URL, max_connections=8, rate_limit=20.0, max_attempts=http.MAX_ATTEMPTS,
+	             cache_dir=None, competitions_ttl=600, low_bandwidth=False):
+		self.api_url = api_url.rstrip('/')
+		# only the encodings that can be decoded are asked for
+		self.headers = headers | {'Accept-Encoding': http.ACCEPT_ENCODING}
+		if self.api_url != API_URL:
+			# the Host header of the browser requests would point another server (e.g. benchmarks/server.py) to the
+			# real API
+			self.headers = {key: value for key, value in self.headers.items() if key != 'Host'}
+		self.broker = broker
+		self.max_connections = max_connections
+		self.max_attempts = max_attempts
+		self.limiter = RateLimiter(rate=rate_limit, max_concurrency=max_connections)
+		self.competitions_ttl = competitions_ttl
+		self.cache = ResponseCache(cache_dir) if cache_dir else None
+		# in low bandwidth mode every response is kept in the cache to be revalidated with a conditional request, and
+		# the competitions are downloaded once per run
+		self.low_bandwidth = low_bandwidth
+		self.competitions = dict()
+		self.session = None
+		# the event loop and its thread are started by the first request, so that a client that never sends one (e.g.
+		# in the parent of the process pool) costs nothing
+		self.loop = None
+		self.thread = None
+		self.loop_lock = threading.Lock()
+
+	def get_loop(self):
+		with self.loop_lock:
+			if self.loop is None:
+				self.loop = asyncio.new_event_loop()
+				self.thread = threading.Thread(target=self.loop.run_forever, name='arena-client', daemon=True)
+				self.thread.start()
+
+		return self.loop
+
+	def submit(self, coroutine):
+		return asyncio.run_coroutine_threadsafe(coroutine, self.get_loop())
+
+	def run(self, coroutine):
+		return self.submit(coroutine).result()
+
+	def get_session(self):
+		if self.session is None:
+			# aiohttp is imported with the first session, so that the runs (and the imports) that send no request never
+			# pay for it
+			import aiohttp
+			connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+			timeout = aiohttp.ClientTimeout(connect=http.CONNECT_TIMEOUT, sock_read=http.READ_TIMEOUT)
+			self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+		return self.session
+
+	async def get_json(self, route, website_id, cache=False, ttl=None):
+		# cache is whether the response can be read from and saved to the cache; ttl is how long it stays valid, None
+		# meaning forever
+		import aiohttp
+		url = f'{self.api_url}/{route}/{website_id}?{{}}='
+
+		if cache and self.cache is not None:
+			payload = self.cache.get(url)
+			metrics.count('cache_requests_total', result='miss' if payload is None else 'hit')
+			if payload is not None:
+				return payload
+
+		# the responses that cannot be cached are stored anyway in low bandwidth mode, already expired, so that the next
+		# request for them can be conditional
+		store = self.cache is not None and (cache or self.low_bandwidth)
+		if not cache:
+			ttl = 0
+		entry = self.cache.get_entry(url) if store and self.low_bandwidth else None
+
+		# a 401 means that the token expired during the run: it is refreshed and the request repeated once. Throttling,
+		# server errors and failed connections are repeated up to max_attempts times
+		refreshed = False
+		attempt = 0
+		while True:
+			token = await self.get_token()
+			headers = self.headers | {'Authorization': token}
+			if entry is not None and entry.get('etag'):
+				headers['If-None-Match'] = entry['etag']
+			if entry is not None and entry.get('last_modified'):
+				headers['If-Modified-Since'] = entry['last_modified']
+
+			sent_at = await self.limiter.acquire()
+			status = None
+			retry_after = None
+			error = None
+			start = time.perf_counter()
+			try:
+				async with self.get_session().get(url, headers=headers) as response:
+					status = response.status
+					retry_after = get_retry_after(response.headers.get('Retry-After'))
+					if status == 200:
+						body = await response.read()
+						payload = json.loads(body)
+						etag = response.headers.get('ETag')
+						last_modified = response.headers.get('Last-Modified')
+						metrics.count('response_bytes_total', len(body), route=route)
+						# the size on the wire is known only if the response was not chunked
+						metrics.count('wire_bytes_total', response.content_length or len(body), route=route)
+			except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+				status = None
+				error = e
+			finally:
+				self.limiter.release(sent_at, status=status, retry_after=retry_after)
+				metrics.count('requests_total', route=route, status=str(status))
+				metrics.observe('request_seconds', time.perf_counter() - start, route=route)
+
+			if status == 200:
+				if store:
+					self.cache.set(url, payload, ttl=ttl, etag=etag, last_modified=last_modified, size=len(body))
+				return payload
+
+			if status == 304 and entry is not None:
+				metrics.count('saved_bytes_total', entry.get('size') or 0, reason='not_modified')
+				self.cache.set(url, entry['payload'], ttl=ttl, etag=entry.get('etag'), last_modified=entry.get('last_modified'),
+				               size=entry.get('size'))
+				return entry['payload']
+
+			if status == 401 and not refreshed:
+				self.broker.invalidate(token)
+				refreshed = True
+				continue
+
+			attempt += 1
+			problem = f'failed with {type(error).__name__} {error}' if error is not None else f'answered {status}'
+			if (error is None and status not in http.RETRY_STATUSES) or attempt >= self.max_attempts:
+				raise ArenaError(f'{url} {problem} after {attempt} attempts') from error
+
+			# a throttled request waits for the Retry-After in the limiter, the others back off here
+			if retry_after is None:
+				delay = http.get_backoff(attempt)
+				logger.warning(f'{url} {problem}, trying again in {delay:.1f} s')
+				await asyncio.sleep(delay)
+
+	async def get_token(self):
+		token = self.broker.peek()
+		if token is None:
+			# getting a new token may start a browser, so it must not block the event loop
+			token = await self.loop.run_in_executor(None, self.broker.get_token)
+
+		return token
+
+	async def get_competition(self, code, refresh=False):
+		# refresh is whether the calendar must be up to date (e.g. to follow the games in progress), in which case
+		# neither the memo nor the cache are used
+		if code in self.competitions and not refresh:
+			metrics.count('skipped_requests_total', route='Competitions')
+			return self.competitions[code]
+
+		competition = await self.get_json('Competitions', code, cache=not refresh, ttl=self.competitions_ttl)
+		if self.low_bandwidth:
+			self.competitions[code] = competition
+
+		return competition
+
+	async def get_match(self, website_id, finished=False):
+		# the payloads of finished games never change, so they are cached forever
+		return await self.get_json('Matches', website_id, cache=finished)
+
+	async def get_events(self, website_id, finished=False):
+		return await self.get_json('Events', website_id, cache=finished)
+
+	async def get_match_and_events(self, website_id, finished=False):
+		info_response, response = await asyncio.gather(self.get_match(website_id, finished=finished),
+		                                                self.get_events(website_id, finished=finished))
+		return info_response, response
+
+	def get_rate_limiter_state(self):
+		return self.limiter.get_state()
+
+	async def _close(self):
+		if self.session is not None:
+			await self.session.close()
+			self.session = None
+
+	def close(self):
+		if self.loop is not None and self.loop.is_running():
+			self.run(self._close())
+			self.loop.call_soon_threadsafe(self.loop.stop)
+			self.thread.join()
+
+
+def configure(**kwargs):
+	settings.update({key: value for key, value in kwargs.items() if value is not None})
+
+
+def get_rate_limiter_state():
+	if _client is None:
+		return None
+
+	return _client.get_rate_limiter_state()
+
+
+def get_client(headers):
+	global _client
+
+	with _client_lock:
+		if _client is None:
+			_client = ArenaClient(headers, auth.get_broker(), api_url=settings['api_url'], max_connections=settings['max_connections'],
+			                      rate_limit=settings['rate_limit'], max_attempts=settings['max_attempts'], cache_dir=settings['cache_dir'],
+			                      competitions_ttl=settings['competitions_ttl'], low_bandwidth=settings['low_bandwidth'])
+			atexit.register(_client.close)
+
+	return _client
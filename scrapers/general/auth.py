@@ -0,0 +1,177 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from utils import metrics
+logger = logging.getLogger('waterpolo')
+
+settings = {
+	'token_file': os.path.join('cache', 'token.json'),
+	'source': None,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class TokenSource(ABC):
+	@abstractmethod
+	def get_token(self):
+		pass
+
+
+class FirefoxTokenSource(TokenSource):
+	# the arena API only accepts requests carrying the Authorization header that total-waterpolo.com sends, so we open a
+	# match page in a headless browser and sniff it
+	def __init__(self, url='https://total-waterpolo.com/tw_match/4432'):
+		self.url = url
+
+	def get_token(self):
+		# the browser is only needed when no valid token is known, so selenium is not imported before
+		from selenium.common.exceptions import SessionNotCreatedException
+		from selenium.webdriver.firefox.options import Options
+		from selenium.webdriver.firefox.service import Service
+		from seleniumwire import webdriver
+		from webdriver_manager.firefox import GeckoDriverManager
+
+		logger.info('Starting Firefox to get a new authorization token')
+
+		exe = GeckoDriverManager().install()
+		options = Options()
+		options.add_argument('-headless')  # os.environ['WDM_LOG'] = str(logging.NOTSET)
+		try:
+			driver = webdriver.Firefox(service=Service(exe), options=options)
+		except SessionNotCreatedException:
+			exe = GeckoDriverManager(version="v0.31.0").install()
+			driver = webdriver.Firefox(service=Service(exe), options=options)
+
+		authorization = ''
+		try:
+			while authorization == '':
+				driver.get(self.url)
+
+				for request in driver.requests:
+					if 'Authorization' in request.headers:
+						authorization = request.headers['Authorization']
+						break
+		finally:
+			driver.quit()
+
+		return authorization
+
+
+class StaticTokenSource(TokenSource):
+	def __init__(self, token):
+		self.token = token
+
+	def get_token(self):
+		return self.token
+
+
+class TokenBroker:
+	# hands out the authorization token to every scraper of the run. The token is saved to disk together with its expiry,
+	# so the browser is started only when no valid token is known
+	def __init__(self, source: TokenSource, token_file=None, default_ttl=3600, margin=60):
+		self.source = source
+		self.token_file = token_file
+		self.default_ttl = default_ttl
+		self.margin = margin
+		self.token = None
+		self.expires_at = None
+		self.lock = threading.Lock()
+
+	def is_valid(self):
+		return self.token is not None and (self.expires_at is None or self.expires_at - self.margin > time.time())
+
+	def peek(self):
+		# the current token without blocking, or None if a new one has to be fetched
+		if self.is_valid():
+			return self.token
+
+		return None
+
+	def get_token(self):
+		with self.lock:
+			if self.is_valid():
+				return self.token
+
+			self.load()
+			if self.is_valid():
+				return self.token
+
+			with metrics.timer('token'):
+				token = self.source.get_token()
+			self.token = token
+			self.expires_at = self.get_expiry(token)
+			self.save()
+
+			return self.token
+
+	def invalidate(self, token):
+		# called when the API refuses the token. Another thread may already have replaced it, in which case the new one
+		# is kept
+		with self.lock:
+			if token != self.token:
+				return
+
+			logger.info('The authorization token has been refused, a new one will be fetched')
+			self.token = None
+			self.expires_at = None
+			if self.token_file is not None and os.path.exists(self.token_file):
+				os.remove(self.token_file)
+
+	def get_expiry(self, token):
+		# tokens are JWTs, whose payload contains the expiry. If it cannot be read, the token is trusted for default_ttl
+		try:
+			payload = token.split()[-1].split('.')[1]
+			payload += '=' * (-len(payload) % 4)
+			return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+		except (IndexError, KeyError, TypeError, ValueError):
+			return time.time() + self.default_ttl
+
+	def load(self):
+		if self.token_file is None:
+			return
+
+		try:
+			with open(self.token_file, 'r', encoding='utf-8') as f:
+				content = json.load(f)
+			self.token = content['token']
+			self.expires_at = content['expires_at']
+		except (FileNotFoundError, KeyError, ValueError):
+			self.token = None
+			self.expires_at = None
+
+	def save(self):
+		if self.token_file is None:
+			return
+
+		directory = os.path.dirname(self.token_file)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+
+		tmp_path = f'{self.token_file}.{os.getpid()}.tmp'
+		with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+			json.dump({'token': self.token, 'expires_at': self.expires_at}, f)
+		os.replace(tmp_path, self.token_file)
+
+
+def configure(**kwargs):
+	settings.update({key: value for key, value in kwargs.items() if value is not None})
+
+
+def get_broker():
+	global _broker
+
+	with _broker_lock:
+		if _broker is None:
+			if settings['source'] is not None:
+				# a token given explicitly is not saved, so that it cannot be mistaken for one of the real API later
+				_broker = TokenBroker(settings['source'])
+			else:
+				_broker = TokenBroker(FirefoxTokenSource(), token_file=settings['token_file'])
+
+	return _broker
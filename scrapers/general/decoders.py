@@ -0,0 +1,211 @@
+import logging
+from utils.batch import ActionBatch
+from utils.constants import *
+logger = logging.getLogger('waterpolo')
+
+PERIODS = {
+	'First_Period': 1,
+	'Second_Period': 2,
+	'Third_Period': 3,
+	'Fourth_Period': 4,
+	'Overtime': 5,
+}
+
+ACTION_FLAGS = {
+	'Clock_Expired': frozenset({CLOCK}),
+	'Lost_Ball': frozenset({LOST}),
+	'Power_Play': frozenset({LOST}),
+	'Penalty': frozenset({PENALTY}),
+	'Regular_Attack': frozenset(),
+	'Offensive_Foul': frozenset({OFFENSIVE_FOUL}),
+	'Ball_Under': frozenset({BALL_UNDER}),
+}
+
+CARDS = {
+	'Yellow': YELLOW_CARD,
+	'Red': RED_CARD,
+}
+
+NO_FLAGS = frozenset()
+
+# event type of the arena API -> function decoding it. Decoders append the actions of an event to the batch
+DECODERS = dict()
+
+
+class DecodingState:
+	# what the decoders of a game share: the names of teams and players, and the running score
+	def __init__(self, game, teams_map, players_map):
+		self.game = game
+		self.teams_map = teams_map
+		self.players_map = players_map
+		self.home_score = 0
+		self.away_score = 0
+
+
+def decoder(event_type):
+	def register(function):
+		DECODERS[event_type] = function
+		return function
+
+	return register
+
+
+def map_action_flag(flag):
+	if flag in ACTION_FLAGS:
+		return ACTION_FLAGS[flag]
+
+	logger.warning(f'Could not recognize action flag "{flag}"')
+	return NO_FLAGS
+
+
+def decode_events(entries, state: DecodingState, actions: ActionBatch):
+	for entry in entries:
+		period = PERIODS.get(entry['period'])
+		if period is None:
+			logger.warning(f'Could not recognize period "{entry["period"]}"')
+			continue
+
+		event_type = entry['type']
+		if event_type is None:
+			continue
+
+		decode = DECODERS.get(event_type)
+		if decode is None:
+			logger.warning(f'Could not recognize action type "{event_type}", ignoring action')
+			logger.debug(entry)
+			continue
+
+		decode(entry, period, 60 * entry['minute'] + entry['seconds'], state, actions)
+
+	return actions
+
+
+@decoder('Turnover')
+def decode_turnover(entry, period, remaining_period_time, state: DecodingState, actions: ActionBatch):
+	turnover = entry['turnover']
+	action_id = entry['id']
+
+	player_id = turnover['lostPossesionPlayer']['playerId']
+	actions.append(action_id, period, remaining_period_time, state.teams_map[turnover['teamId']], state.home_score, state.away_score,
+	               state.players_map[player_id], player_id, TURNOVER, map_action_flag(turnover['type']), None, None, None, None)
+
+	if turnover['wonPossesionPlayerId'] is not None:
+		player_id = turnover['wonPossesionPlayer']['playerId']
+		actions.append(f'{action_id}-STL', period, remaining_period_time, state.teams_map[turnover['wonPossesionPlayer']['teamId']],
+		               state.home_score, state.away_score, state.players_map[player_id], player_id, STEAL, NO_FLAGS, None, None, None, None)
+
+
+@decoder('Card')
+def decode_card(entry, period, remaining_period_time, state: DecodingState, actions: ActionBatch):
+	card = entry['card']
+
+	description = CARDS.get(card['type'])
+	if description is None:
+		logger.warning(f'Could not recognize card "{card["type"]}"')
+		return
+
+	if card['cardedPlayerId'] is not None:
+		player_id = card['cardedPlayer']['playerId']
+		player = state.players_map[player_id]
+	else:
+		player = None
+		player_id = None
+
+	actions.append(entry['id'], period, remaining_period_time, state.teams_map[card['teamId']], state.home_score, state.away_score,
+	               player, player_id, description, NO_FLAGS, None, None, None, None)
+
+
+@decoder('Timeout')
+def decode_timeout(entry, period, remaining_period_time, state: DecodingState, actions: ActionBatch):
+	actions.append(entry['id'], period, remaining_period_time, state.teams_map[entry['timeout']['teamId']], state.home_score,
+	               state.away_score, None, None, TURNOVER, NO_FLAGS, None, None, None, None)
+
+
+@decoder('Swim_Off')
+def decode_swim_off(entry, period, remaining_period_time, state: DecodingState, actions: ActionBatch):
+	swimoff = entry['swimoff']
+	home_player_id = swimoff['homeTeamSwimmer']['playerId']
+	away_player_id = swimoff['awayTeamSwimmer']['playerId']
+
+	if swimoff['winnerSwimmer'] is None:
+		return
+
+	if home_player_id == swimoff['winnerSwimmer']['playerId']:
+		winning_player_id, winning_team = home_player_id, state.game['home_team']
+		losing_player_id, losing_team = away_player_id, state.game['away_team']
+	else:
+		winning_player_id, winning_team = away_player_id, state.game['away_team']
+		losing_player_id, losing_team = home_player_id, state.game['home_team']
+
+	actions.append(entry['id'], period, remaining_period_time, winning_team, state.home_score, state.away_score,
+	               state.players_map[winning_player_id], winning_player_id, SWIM_OFF_WON, NO_FLAGS, None, None, None, None)
+	actions.append(f'{entry["id"]}-SOL', period, remaining_period_time, losing_team, state.home_score, state.away_score,
+	               state.players_map[losing_player_id], losing_player_id, SWIM_OFF_LOST, NO_FLAGS, None, None, None, None)
+
+
+@decoder('Exclusion')
+def decode_exclusion(entry, period, remaining_period_time, state: DecodingState, actions: ActionBatch):
+	exclusion = entry['exclusion']
+
+	if exclusion['excludedPlayerId'] is not None:
+		player_id = exclusion['excludedPlayer']['playerId']
+		player = state.players_map[player_id]
+	else:
+		player = None
+		player_id = None
+
+	flags = set()
+	if exclusion['isPenaltyExclusion']:
+		flags.add(PENALTY_FOUL)
+	if exclusion['isDoubleExclusion']:
+		flags.add(DOUBLE_EXCLUSION)
+
+	x = exclusion['locationX']
+	y = exclusion['locationY']
+
+	actions.append(entry['id'], period, remaining_period_time, state.teams_map[exclusion['teamId']], state.home_score,
+	               state.away_score, player, player_id, EXCLUSION, flags, x, y, None, None)
+
+	if exclusion['fouledPlayerId'] is not None:
+		player_id = exclusion['fouledPlayer']['playerId']
+		actions.append(f'{entry["id"]}-FD', period, remaining_period_time, state.teams_map[exclusion['fouledPlayer']['teamId']],
+		               state.home_score, state.away_score, state.players_map[player_id], player_id, FOUL_DRAWN, flags, x, y, None, None)
+
+
+# actions linked to a shot: (key of the shot, suffix of the action id, action type)
+SHOT_LINKED_ACTIONS = (
+	('blockedBy', 'BLK', BLOCK),
+	('assistedBy', 'AST', ASSIST),
+	('savedBy', 'SAVE', SAVE),
+)
+
+
+@decoder('Shot')
+def decode_shot(entry, period, remaining_period_time, state: DecodingState, actions: ActionBatch):
+	shot = entry['shot']
+	action_id = entry['id']
+
+	description = GOAL if shot['isGoal'] else MISS
+	team = state.teams_map[shot['teamId']]
+
+	if description == GOAL and team == state.game['home_team']:
+		state.home_score += 1
+	elif description == GOAL and team == state.game['away_team']:
+		state.away_score += 1
+
+	flags = map_action_flag(shot['type'])
+	x = shot['locationX']
+	y = shot['locationY']
+	target_x = shot['targetX']
+	target_y = shot['targetY']
+
+	player_id = shot['takenBy']['playerId']
+	actions.append(action_id, period, remaining_period_time, team, state.home_score, state.away_score, state.players_map[player_id],
+	               player_id, description, flags, x, y, target_x, target_y)
+
+	for key, suffix, linked_type in SHOT_LINKED_ACTIONS:
+		if shot[f'{key}Id'] is not None:
+			player_id = shot[key]['playerId']
+			actions.append(f'{action_id}-{suffix}', period, remaining_period_time, state.teams_map[shot[key]['teamId']],
+			               state.home_score, state.away_score, state.players_map[player_id], player_id, linked_type, flags, x,
+			               y, target_x, target_y)
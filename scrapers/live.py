@@ -0,0 +1,150 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from scrapers.scraper import GameContext, LiveGame
+from utils.constants import *
+from utils import metrics
+logger = logging.getLogger('sdeng')
+
+# seconds between two polls of a game in progress: the interval is reset to the minimum when new events come, and grows
+# up to the maximum while nothing happens
+LIVE_POLL_INTERVAL = 5.0
+LIVE_MAX_POLL_INTERVAL = 60.0
+LIVE_BACKOFF = 1.5
+
+
+class LivePoller:
+	# follows the games in progress of every league and season until they are over, in a single loop so that the games of
+	# a league are not missed while those of another are followed. Every game is polled on its own interval, which is reset
+	# to poll_interval when new events come and grows up to max_poll_interval while nothing happens, and only the new
+	# actions are cleaned and written. The calendars are refreshed every max_poll_interval, to find the games that start or
+	# end. kwargs are those of Scraper.download
+	def __init__(self, scrapers, **kwargs):
+		self.scrapers = scrapers
+		self.leagues = {scraper: scraper.get_league()['name'] for scraper in scrapers}
+		self.min_interval = kwargs.get('poll_interval') or LIVE_POLL_INTERVAL
+		self.max_interval = max(self.min_interval, kwargs.get('max_poll_interval') or LIVE_MAX_POLL_INTERVAL)
+		self.workers = max(1, kwargs.get('workers') or 1)
+		self.kwargs = kwargs
+		# the games that end must be found too, whatever the status filter
+		self.calendar_kwargs = kwargs | {'status': None, 'refresh': True}
+		# (league, website id) -> (scraper, LiveGame)
+		self.games = dict()
+		# the seasons are kept between two refreshes, with the teams and players already seen
+		self.seasons = {scraper: dict() for scraper in scrapers}
+		self.editions = dict()
+		self.refreshed_at = None
+		# the (scraper, season) the writer, shared by the scrapers, is currently writing
+		self.current = None
+
+	def run(self):
+		with ThreadPoolExecutor(max_workers=self.workers) as executor:
+			while True:
+				if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.max_interval:
+					self.refresh()
+
+				if not self.games:
+					break
+
+				now = time.monotonic()
+				polls = [(scraper, live, scraper.submit_live_actions(executor, live)) for scraper, live in self.games.values()
+				         if live.next_poll <= now]
+				self.write(polls)
+
+				if not self.games:
+					break
+
+				wake_at = min([live.next_poll for _, live in self.games.values()] + [self.refreshed_at + self.max_interval])
+				time.sleep(max(0.0, wake_at - time.monotonic()))
+
+		if self.current is not None:
+			with metrics.timer('write'):
+				self.current[0].writer.finish_season()
+			self.current = None
+
+	def refresh(self):
+		self.refreshed_at = time.monotonic()
+
+		for scraper in self.scrapers:
+			seasons = self.seasons[scraper]
+
+			for season in scraper.get_seasons(**self.kwargs):
+				season = seasons.setdefault((season['start'], season['end']), season)
+
+				try:
+					games = scraper.get_calendar(season, **self.calendar_kwargs)
+				except Exception:
+					logger.exception(f'Could not refresh the calendar of {self.leagues[scraper]} {season["start"]}-{season["end"]}')
+					continue
+
+				self.update(scraper, season, games)
+
+	def update(self, scraper, season, games):
+		for game in games:
+			key = (self.leagues[scraper], game['website_id'])
+			followed = self.games.get(key)
+
+			if followed is None and game['status'] == LIVE:
+				self.start(scraper, season)
+				scraper.insert_game(game)
+				logger.info(f'Following {game["home_team"]}-{game["away_team"]}')
+				context = GameContext(scraper.current_league, season, scraper.current_edition, game)
+				self.games[key] = (scraper, LiveGame(context, self.min_interval))
+			elif followed is not None and game['status'] != LIVE:
+				# a last poll gets the last events, then the game is written again with its final status
+				live = followed[1]
+				live.context.game.update(status=game['status'], home_score=game['home_score'], away_score=game['away_score'])
+				live.final = True
+				live.next_poll = 0.0
+
+	def start(self, scraper, season):
+		# points the writer to the season, finishing the one it was writing, so that the writers that keep a season in
+		# memory until it is finished never mix two of them
+		key = (scraper, id(season))
+
+		if self.current is None or (self.current[0], id(self.current[1])) != key:
+			if self.current is not None:
+				with metrics.timer('write'):
+					self.current[0].writer.finish_season()
+
+			scraper.start_season(season, scraper.start_league())
+			self.editions[key] = scraper.current_edition
+			self.current = (scraper, season)
+
+		# the calendars of the other seasons of the scraper may have been refreshed since
+		scraper.current_season = season
+		scraper.current_edition = self.editions[key]
+
+	def write(self, polls):
+		# the polls are written season by season, starting with the one the writer is on, so that the writer changes season
+		# at most once for each of them
+		current_season = self.current[1] if self.current is not None else None
+		polls = sorted(polls, key=lambda poll: (poll[1].context.season is not current_season, self.leagues[poll[0]],
+		                                        poll[1].context.season['start']))
+
+		for scraper, live, future in polls:
+			game = live.context.game
+			self.start(scraper, live.context.season)
+
+			try:
+				new_actions = scraper.write_live_actions(live, future.result())
+			except Exception:
+				logger.exception(f'Could not poll {game["home_team"]}-{game["away_team"]}')
+				new_actions = 0
+
+			if live.final:
+				scraper.writer.check_and_insert_game(game)
+				metrics.count('games_total', league=self.leagues[scraper])
+				self.games.pop((self.leagues[scraper], game['website_id']))
+				logger.info(f'{game["home_team"]}-{game["away_team"]} is over')
+				continue
+
+			if new_actions:
+				live.interval = self.min_interval
+			else:
+				live.interval = min(self.max_interval, live.interval * LIVE_BACKOFF)
+			live.next_poll = time.monotonic() + live.interval
+
+		# the rows written so far can be read while the games go on
+		if self.current is not None:
+			self.current[0].writer.flush()
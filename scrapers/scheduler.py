@@ -0,0 +1,203 @@
+import heapq
+import logging
+import time
+from datetime import datetime
+from utils.constants import *
+logger = logging.getLogger('sdeng')
+
+# seconds from the start of a game to its final status in the API, when the game is downloaded
+GAME_DURATION = 2 * 3600
+# a game that is not over when expected is checked again this many seconds later, at most MAX_RETRIES times
+RETRY_INTERVAL = 15 * 60
+MAX_RETRIES = 8
+# seconds between two refreshes of the calendars, to find the games that are added or rescheduled
+CALENDAR_INTERVAL = 6 * 3600
+
+
+class ScheduledGame:
+	def __init__(self, scraper, season, game, expected_end):
+		self.scraper = scraper
+		self.season = season
+		self.game = game
+		self.expected_end = expected_end
+		# None once the game was given up, until it is rescheduled
+		self.due_at = expected_end
+		self.retries = 0
+
+
+class Scheduler:
+	# downloads every game once it should be over, according to the calendars of the leagues, and sleeps in between. The
+	# calendar of a season is refreshed when one of its games is due, and every calendar is refreshed every
+	# calendar_interval seconds, so that the games that are added, rescheduled or over early are followed. A game that is
+	# not over when expected is checked again every retry_interval seconds, at most max_retries times. kwargs are those
+	# of Scraper.download
+	def __init__(self, scrapers, game_duration=GAME_DURATION, retry_interval=RETRY_INTERVAL, max_retries=MAX_RETRIES,
+	             calendar_interval=CALENDAR_INTERVAL, on_download=None, **kwargs):
+		self.scrapers = scrapers
+		self.leagues = {scraper: scraper.get_league()['name'] for scraper in scrapers}
+		self.game_duration = game_duration
+		self.retry_interval = retry_interval
+		self.max_retries = max_retries
+		self.calendar_interval = calendar_interval
+		self.on_download = on_download
+		self.kwargs = kwargs
+		# the filters of run.py apply to the calendar, except for the status: the games not over yet are the ones to wait
+		# for. The calendar is always up to date
+		self.calendar_kwargs = kwargs | {'status': None, 'refresh': True}
+		# (league, website id) -> ScheduledGame, and the queue of (due_at, sequence, key) where the entries of the games
+		# rescheduled or downloaded since are left behind
+		self.games = dict()
+		self.queue = []
+		self.sequence = 0
+		# the seasons are kept between two refreshes, with the teams and players already seen
+		self.seasons = {scraper: dict() for scraper in scrapers}
+		self.refreshed_at = None
+
+	def run(self):
+		while True:
+			if self.refreshed_at is None or time.time() >= self.refreshed_at + self.calendar_interval:
+				self.refresh()
+
+			due = self.pop_due()
+			if due:
+				self.download(due)
+				continue
+
+			wake_at = self.refreshed_at + self.calendar_interval
+			if self.queue:
+				wake_at = min(wake_at, self.queue[0][0])
+
+			scheduled = sum(1 for scheduled in self.games.values() if scheduled.due_at is not None)
+			logger.info(f'{scheduled} games scheduled, sleeping until {datetime.fromtimestamp(wake_at):%Y-%m-%d %H:%M:%S}')
+			time.sleep(max(0.0, wake_at - time.time()))
+
+	def refresh(self):
+		self.refreshed_at = time.time()
+
+		for scraper in self.scrapers:
+			seasons = self.seasons[scraper]
+
+			for season in scraper.get_seasons(**self.kwargs):
+				season = seasons.setdefault((season['start'], season['end']), season)
+
+				try:
+					games = scraper.get_calendar(season, **self.calendar_kwargs)
+				except Exception:
+					logger.exception(f'Could not refresh the calendar of {self.leagues[scraper]} {season["start"]}-{season["end"]}')
+					continue
+
+				over = self.update(scraper, season, games)
+				if over:
+					self.download_games(scraper, season, over)
+
+	def update(self, scraper, season, games, due=frozenset()):
+		# schedules the games of the calendar that are not over yet, and returns those already scheduled that are over.
+		# due are the website ids of the games whose time has come
+		over = []
+
+		for game in games:
+			key = (self.leagues[scraper], game['website_id'])
+			scheduled = self.games.get(key)
+
+			if game['status'] == PLAYED:
+				if scheduled is not None:
+					over.append(game)
+				continue
+
+			expected_end = game.get('start_time', game['date']).timestamp() + self.game_duration
+
+			if scheduled is None:
+				scheduled = ScheduledGame(scraper, season, game, expected_end)
+				self.games[key] = scheduled
+				self.push(key, scheduled)
+			elif scheduled.expected_end != expected_end:
+				logger.info(f'{game["home_team"]}-{game["away_team"]} was rescheduled to {game["date"]}')
+				scheduled.game = game
+				scheduled.expected_end = expected_end
+				scheduled.due_at = expected_end
+				scheduled.retries = 0
+				self.push(key, scheduled)
+			elif game['website_id'] in due:
+				self.retry(key, scheduled, f'is still {game["status"]}')
+
+		return over
+
+	def retry(self, key, scheduled, reason):
+		game = scheduled.game
+		scheduled.retries += 1
+
+		if scheduled.retries > self.max_retries:
+			# the game stays known, so that it is followed again only if it is rescheduled or over
+			logger.warning(f'{game["home_team"]}-{game["away_team"]} of {game["date"]} {reason} after {self.max_retries} retries, '
+			               f'giving up')
+			scheduled.due_at = None
+			return
+
+		logger.info(f'{game["home_team"]}-{game["away_team"]} of {game["date"]} {reason}, trying again in {self.retry_interval:.0f} s')
+		scheduled.due_at = time.time() + self.retry_interval
+		self.push(key, scheduled)
+
+	def push(self, key, scheduled):
+		self.sequence += 1
+		heapq.heappush(self.queue, (scheduled.due_at, self.sequence, key))
+
+	def pop_due(self):
+		due = []
+		now = time.time()
+
+		while self.queue and self.queue[0][0] <= now:
+			due_at, _, key = heapq.heappop(self.queue)
+			scheduled = self.games.get(key)
+
+			if scheduled is not None and scheduled.due_at == due_at:
+				due.append((key, scheduled))
+
+		return due
+
+	def download(self, due):
+		# the due games of a season need a single request for its calendar
+		seasons = dict()
+		for key, scheduled in due:
+			seasons.setdefault((scheduled.scraper, id(scheduled.season)), []).append((key, scheduled))
+
+		for due_games in seasons.values():
+			scraper = due_games[0][1].scraper
+			season = due_games[0][1].season
+
+			try:
+				games = scraper.get_calendar(season, **self.calendar_kwargs)
+			except Exception:
+				logger.exception(f'Could not refresh the calendar of {self.leagues[scraper]} {season["start"]}-{season["end"]}')
+				for key, scheduled in due_games:
+					self.retry(key, scheduled, 'could not be checked')
+				continue
+
+			website_ids = {game['website_id'] for game in games}
+			for key, scheduled in due_games:
+				if key[1] not in website_ids:
+					logger.warning(f'{scheduled.game["home_team"]}-{scheduled.game["away_team"]} is not in the calendar anymore')
+					self.games.pop(key)
+
+			over = self.update(scraper, season, games, due={key[1] for key, _ in due_games})
+			if over:
+				self.download_games(scraper, season, over)
+
+	def download_games(self, scraper, season, games):
+		keys = [(self.leagues[scraper], game['website_id']) for game in games]
+
+		try:
+			scraper.start_season(season, scraper.start_league())
+			scraper.download_games(season, games, **self.kwargs)
+		except Exception:
+			logger.exception(f'Could not download {len(games)} games of {self.leagues[scraper]} {season["start"]}-{season["end"]}')
+			for key in keys:
+				self.retry(key, self.games[key], 'could not be downloaded')
+			return
+
+		for key in keys:
+			self.games.pop(key)
+
+		logger.info(f'Downloaded {len(games)} games of {self.leagues[scraper]} {season["start"]}-{season["end"]}')
+
+		if self.on_download is not None:
+			self.on_download()
@@ -1,19 +1,44 @@
 import logging
 import os.path
-import re
 from abc import ABC, abstractmethod
-from pathlib import Path
-import numpy as np
-import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm.contrib.logging import logging_redirect_tqdm
-from unidecode import unidecode
 from utils.constants import *
-import yaml
-from utils import utils
-from queue import Queue
+from utils import metrics, utils
+from utils.batch import ActionBatch, ACTION_SCHEMA
+from utils.manifest import Manifest
 from writers.writer import Writer
 logger = logging.getLogger('sdeng')
 
+
+class GameContext:
+	# everything a single game needs while it is downloaded and cleaned, so that games can be processed concurrently
+	def __init__(self, league, season, edition, game):
+		self.league = league
+		self.season = season
+		self.edition = edition
+		self.game = game
+		# the players of the game, by their website id: (player, contract) as they are in this game's roster, which may
+		# differ from another game's while both are being processed
+		self.players = dict()
+
+
+class LiveGame:
+	# what the polls of a game in progress share: the events already seen, what the scraper needs to decode the next ones
+	# and the state of the cleaning (action numbers and linking), so that every poll only cleans and writes the new events
+	def __init__(self, context: GameContext, interval):
+		self.context = context
+		self.last_event_id = None
+		self.event_ids = set()
+		self.decoding_state = None
+		self.action_number = 1
+		self.pending_actions = dict()
+		self.interval = interval
+		self.next_poll = 0.0
+		self.final = False
+
+
 class Scraper(ABC):
 	def __init__(self, writer: Writer):
 		self.writer = writer
@@ -21,7 +46,6 @@ class Scraper(ABC):
 		self.teams_cache = dict()
 		self.players_cache = dict()
 		self.current_season = None
-		self.current_game = None
 		self.current_league = None
 		self.current_edition = None
 		return
@@ -47,98 +71,254 @@ class Scraper(ABC):
 		pass
 
 	@abstractmethod
-	def download_actions(self):
+	def download_actions(self, context: GameContext):
 		pass
 
-	def get_actions(self, **kwargs):
-		actions = self.download_actions()
+	@abstractmethod
+	def download_boxscores(self, context: GameContext):
+		pass
+
+	@abstractmethod
+	def download_live_actions(self, live: LiveGame):
+		# the raw actions of the events that came since the last poll of the game
+		pass
+
+	def get_actions(self, context: GameContext):
+		actions = self.download_actions(context)
 
 		return actions
 
+	def submit_actions(self, executor, context: GameContext):
+		return executor.submit(self.get_actions, context)
+
+	def write_actions(self, context: GameContext, raw_actions):
+		with metrics.timer('clean'):
+			actions = self.clean_actions(raw_actions, context)
+
+		with metrics.timer('write'):
+			self.writer.check_and_insert_actions(actions)
+
+		metrics.count('games_total', league=context.league['name'])
+		metrics.count('actions_total', len(actions), league=context.league['name'])
+
+	def submit_live_actions(self, executor, live: LiveGame):
+		return executor.submit(self.download_live_actions, live)
+
+	def write_live_actions(self, live: LiveGame, raw_actions):
+		context = live.context
+		# the first actions of the game replace those a previous run may have written, the next ones are added to them
+		first = live.action_number == 1
+
+		with metrics.timer('clean'):
+			actions = self.clean_actions(raw_actions, context, live)
+
+		with metrics.timer('write'):
+			self.writer.append_actions(actions, replace=first)
+
+		metrics.count('actions_total', len(actions), league=context.league['name'])
+
+		return len(actions)
+
+	def get_boxscores(self, context: GameContext):
+		return self.download_boxscores(context)
+
+	def submit_boxscores(self, executor, context: GameContext):
+		return executor.submit(self.get_boxscores, context)
+
+	def write_boxscores(self, context: GameContext, raw_players):
+		with metrics.timer('clean'):
+			teams, players = self.clean_boxscores(raw_players, context)
+
+		with metrics.timer('write'):
+			self.writer.insert_boxscores(teams, players)
+
+		metrics.count('games_total', league=context.league['name'])
+
+	def get_manifest(self, season, **kwargs):
+		if not kwargs.get('incremental'):
+			return None
+
+		# the games whose box scores only were written still need their play-by-play, so they have their own manifest
+		suffix = '.boxscores' if kwargs.get('no_pbp') else ''
+		path = os.path.join(kwargs['manifest_dir'], self.current_league['name'], f'{season["start"]}-{season["end"]}{suffix}.json')
+
+		return Manifest(path)
+
+	def is_game_selected(self, game, **kwargs):
+		# whether the game passes the filters of run.py: website ids, rounds, statuses, dates (both included) and teams,
+		# which match any part of the home or away team's name
+		if kwargs.get('website_ids') and str(game['website_id']) not in kwargs['website_ids']:
+			return False
+
+		if kwargs.get('rounds') and game['round'] not in kwargs['rounds']:
+			return False
+
+		if kwargs.get('status') and game['status'] not in {status.lower() for status in kwargs['status']}:
+			return False
+
+		if kwargs.get('start_date') and game['date'].date() < kwargs['start_date'].date():
+			return False
+
+		if kwargs.get('end_date') and game['date'].date() > kwargs['end_date'].date():
+			return False
+
+		if kwargs.get('teams'):
+			team_names = (game['home_team'].lower(), game['away_team'].lower())
+			if not any(team.lower() in team_name for team in kwargs['teams'] for team_name in team_names):
+				return False
+
+		return True
+
 	def get_player_url(self, player):
 		return player['player_url']
 
-	def download(self, **kwargs):
+	def start_league(self):
 		league = self.get_league()
 		logger.info(f'New league: {league["name"]}')
 		self.current_league = league
-		league_id = self.writer.check_and_insert_league(league)
 
-		for season in self.get_seasons(**kwargs):
-			season_id = self.writer.check_and_insert_season(season)
-			season['season_id'] = season_id
+		return self.writer.check_and_insert_league(league)
+
+	def start_season(self, season, league_id):
+		season_id = self.writer.check_and_insert_season(season)
+		season['season_id'] = season_id
 
-			self.current_season = season
+		self.current_season = season
 
-			edition = self.get_edition_details()
-			edition['league_id'] = league_id
-			edition['season_id'] = season_id
-			edition_id = self.writer.check_and_insert_edition(edition)
-			edition['edition_id'] = edition_id
+		edition = self.get_edition_details()
+		edition['league_id'] = league_id
+		edition['season_id'] = season_id
+		edition_id = self.writer.check_and_insert_edition(edition)
+		edition['edition_id'] = edition_id
 
-			self.current_edition = edition
+		self.current_edition = edition
 
-			games = self.get_games(**kwargs)
+	def insert_game(self, game):
+		# inserts the game, and its teams with their franchises and their participation in the edition the first time they
+		# are seen
+		season = self.current_season
+		season_id = season['season_id']
+		edition_id = self.current_edition['edition_id']
 
-			with logging_redirect_tqdm():
-				if kwargs['tg'] is True:
-					from tqdm.contrib.telegram import tqdm
-					iterator = tqdm(games, token=kwargs['tg_config']['token'], chat_id=kwargs['tg_config']['users'], desc=f'{self.current_league["name"]} {season["start"] % 100:02d}-{season["end"] % 100:02d}',
-				                 position=0, leave=True)
+		for team_name in [game['home_team'], game['away_team']]:
+			team_str = f'{season["start"]}-{season["end"]}:{team_name}'
+
+			if team_str not in self.franchises_cache:
+				franchise = self.get_franchise(team_name)
+				franchise_id = self.writer.check_and_insert_franchise(franchise)
+				self.franchises_cache[team_str] = franchise_id
+			else:
+				franchise_id = self.franchises_cache[team_str]
+
+			if team_str not in self.teams_cache:
+				team = self.get_team_details(team_name)
+				team['franchise_id'] = franchise_id
+
+				team_id = self.writer.check_and_insert_team(team)
+				self.teams_cache[team_str] = team_id
+				edition_participant = {
+					'team_id': team_id,
+					'edition_id': edition_id,
+					'team': team_name,
+				}
+				if 'conference' in team:
+					edition_participant['conference'] = team['conference']
 				else:
-					from tqdm import tqdm
-					iterator = tqdm(games,
-				                 desc=f'{self.current_league["name"]} {season["start"] % 100:02d}-{season["end"] % 100:02d}',
-				                 position=0, leave=True)
-				for game in iterator:
-					for team_name in [game['home_team'], game['away_team']]:
-						team_str = f'{season["start"]}-{season["end"]}:{team_name}'
-
-						if team_str not in self.franchises_cache:
-							franchise = self.get_franchise(team_name)
-							franchise_id = self.writer.check_and_insert_franchise(franchise)
-							self.franchises_cache[team_str] = franchise_id
-						else:
-							franchise_id = self.franchises_cache[team_str]
-
-						if team_str not in self.teams_cache:
-							team = self.get_team_details(team_name)
-							team['franchise_id'] = franchise_id
-
-							team_id = self.writer.check_and_insert_team(team)
-							self.teams_cache[team_str] = team_id
-							edition_participant = {
-								'team_id': team_id,
-								'edition_id': edition_id,
-								'team': team_name,
-							}
-							if 'conference' in team:
-								edition_participant['conference'] = team['conference']
-							else:
-								edition_participant['conference'] = None
-
-							self.writer.check_and_insert_edition_participant(edition_participant)
-						else:
-							team_id = self.teams_cache[team_str]
-
-						if team_name == game['home_team']:
-							game['home_team_id'] = team_id
-						elif team_name == game['away_team']:
-							game['away_team_id'] = team_id
-
-					game['season_id'] = season_id
-					game['edition_id'] = edition_id
-					game_id = self.writer.check_and_insert_game(game)
-					game['game_id'] = game_id
-					logger.info(f'New game: {game["home_team"]}-{game["away_team"]} of {game["date"]}')
-
-					self.current_game = game
-
-					if game['status'] in (PLAYED, LIVE):
-						actions = self.download_actions()
-						actions = self.clean_actions(actions)
-
-						self.writer.check_and_insert_actions(actions)
+					edition_participant['conference'] = None
+
+				self.writer.check_and_insert_edition_participant(edition_participant)
+			else:
+				team_id = self.teams_cache[team_str]
+
+			if team_name == game['home_team']:
+				game['home_team_id'] = team_id
+			elif team_name == game['away_team']:
+				game['away_team_id'] = team_id
+
+		game['season_id'] = season_id
+		game['edition_id'] = edition_id
+		game_id = self.writer.check_and_insert_game(game)
+		game['game_id'] = game_id
+
+		return game_id
+
+	def get_calendar(self, season, **kwargs):
+		# the games of a season, without writing anything
+		self.current_season = season
+
+		with metrics.timer('games'):
+			return self.get_games(**kwargs)
+
+	def download(self, **kwargs):
+		league_id = self.start_league()
+
+		for season in self.get_seasons(**kwargs):
+			self.start_season(season, league_id)
+			games = self.get_calendar(season, **kwargs)
+			self.download_games(season, games, **kwargs)
+
+	def download_games(self, season, games, **kwargs):
+		# downloads and writes the given games of the season, which must have been started with start_season
+		workers = max(1, kwargs.get('workers') or 1)
+		league = self.current_league
+		edition = self.current_edition
+
+		manifest = self.get_manifest(season, **kwargs)
+		if manifest is not None:
+			games = [game for game in games if not manifest.is_up_to_date(game['website_id'], game['status'])]
+			logger.info(f'{len(games)} new or changed games')
+
+		# without play-by-play, only the box scores of the games are downloaded and written
+		if kwargs.get('no_pbp'):
+			submit_game, write_game = self.submit_boxscores, self.write_boxscores
+		else:
+			submit_game, write_game = self.submit_actions, self.write_actions
+
+		with logging_redirect_tqdm(), ThreadPoolExecutor(max_workers=workers) as executor:
+			if kwargs['tg'] is True:
+				from tqdm.contrib.telegram import tqdm
+				iterator = tqdm(games, token=kwargs['tg_config']['token'], chat_id=kwargs['tg_config']['users'], desc=f'{self.current_league["name"]} {season["start"] % 100:02d}-{season["end"] % 100:02d}',
+			                 position=0, leave=True)
+			else:
+				from tqdm import tqdm
+				iterator = tqdm(games,
+			                 desc=f'{self.current_league["name"]} {season["start"] % 100:02d}-{season["end"] % 100:02d}',
+			                 position=0, leave=True)
+
+			# games whose actions are being downloaded, in calendar order. They are written back in the same order
+			# they were submitted, so that the output does not depend on which download finishes first
+			pending_games = deque()
+
+			for game in iterator:
+				self.insert_game(game)
+				logger.info(f'New game: {game["home_team"]}-{game["away_team"]} of {game["date"]}')
+
+				if game['status'] in (PLAYED, LIVE):
+					context = GameContext(league, season, edition, game)
+					pending_games.append((context, submit_game(executor, context)))
+				elif manifest is not None:
+					manifest.mark(game['website_id'], game['status'])
+
+				# at most `workers` games are in flight: wait for the oldest one before submitting a new one
+				while len(pending_games) >= workers:
+					context, future = pending_games.popleft()
+					write_game(context, future.result())
+					if manifest is not None:
+						manifest.mark(context.game['website_id'], context.game['status'])
+
+			while pending_games:
+				context, future = pending_games.popleft()
+				write_game(context, future.result())
+				if manifest is not None:
+					manifest.mark(context.game['website_id'], context.game['status'])
+
+		with metrics.timer('write'):
+			self.writer.finish_season()
+
+		# the manifest is saved only once the writer is done with the season, so that it never lists games that
+		# are not in the output
+		if manifest is not None:
+			manifest.save()
 
 	# def add_period_start_and_end(self, raw_actions, period_duration=600, periods=4, elam_ending=False):
 	# 	actions = []
@@ -263,201 +443,185 @@ class Scraper(ABC):
 		return edition
 
 	def clean_name(self, name):
-		if name is None:
-			return None
-
-		def uppercase_nth_char(string, index):
-			return string[:index] + string[index].upper() + string[index + 1:]
-
-		name = unidecode(name)
-
-		# remove punctuation marks
-		for char in ('.', ','):
-			name = name.replace(char, '')
-
-		# replace apostrophes
-		for char in ('"', '’', "''"):
-			name = name.replace(char, "'")
+		return utils.clean_name(name)
 
-		new_name_split = list()
+	def clean_names(self, names):
+		return utils.clean_names(names)
 
-		for split_temp in name.split():
-			split_temp = split_temp.title()
-
-			if split_temp.startswith('Mc') and len(split_temp) > 2:
-				split_temp = uppercase_nth_char(split_temp, 2)
+	def get_debug_url(self, context: GameContext):
+		if 'pbp_url' in context.game:
+			return context.game['pbp_url']
+		else:
+			return context.game['website_id']
+
+	def get_team_id(self, game, team_name):
+		team_name = team_name.title()
+
+		if team_name == game['home_team'].title():
+			return game['home_team_id']
+		elif team_name == game['away_team'].title():
+			return game['away_team_id']
+
+		return None
+
+	def insert_player(self, context: GameContext, team_id, player_id_website):
+		# inserts a player of the game with their contract with the team, which is done once for every team they play for
+		player, contract = context.players[player_id_website]
+
+		contract['season_id'] = context.season['season_id']
+		contract['team_id'] = team_id
+
+		if 'full_name' not in player:
+			logger.error(f'Missing player\'s full name!\nPlayer is {player}')
+			exit(0)
+
+		return self.writer.insert_player_and_contract(player, contract)
+
+	def clean_boxscores(self, raw_players, context: GameContext):
+		# raw_players are the (website id, full name, team name) of the players in the game's roster, whose details are in
+		# the context's players. The scores are those of the games' listing
+		game = context.game
+		edition = context.edition
+
+		teams = []
+		for team_id, opponent_id, home, goals, goals_against in (
+				(game['home_team_id'], game['away_team_id'], True, game['home_score'], game['away_score']),
+				(game['away_team_id'], game['home_team_id'], False, game['away_score'], game['home_score'])):
+			if game['status'] != PLAYED or goals is None or goals_against is None:
+				result = None
+			elif goals > goals_against:
+				result = 'W'
+			elif goals < goals_against:
+				result = 'L'
+			else:
+				result = 'D'
 
-			if split_temp in ('Ii', 'Iii', 'Iv'):
-				split_temp = split_temp.upper()
+			teams.append({
+				'season_id': edition['season_id'],
+				'edition_id': edition['edition_id'],
+				'game_id': game['game_id'],
+				'team_id': team_id,
+				'opponent_id': opponent_id,
+				'home': home,
+				'goals': goals,
+				'goals_against': goals_against,
+				'result': result,
+			})
+
+		players = []
+		for player_id_website, full_name, team_name in raw_players:
+			team_id = self.get_team_id(game, team_name)
+			if team_id is None:
+				logger.warning(f'{full_name} plays for {team_name}, which is not a team of {game["home_team"]}-{game["away_team"]}')
+				continue
 
-			new_name_split.append(split_temp)
+			player_str = f'{team_id} {full_name}'
 
-		name = ' '.join(new_name_split)
+			if player_str not in self.players_cache:
+				player_id = self.insert_player(context, team_id, player_id_website)
+				self.players_cache[player_str] = player_id
+			else:
+				player_id = self.players_cache[player_str]
 
-		for string_to_remove in (' III', ' II', ' IV', ' Jr', ' Sr'):
-			name = name.replace(string_to_remove, '').strip()
+			player, contract = context.players[player_id_website]
 
-		return name
+			players.append({
+				'season_id': edition['season_id'],
+				'edition_id': edition['edition_id'],
+				'game_id': game['game_id'],
+				'team_id': team_id,
+				'opponent_id': game['away_team_id'] if team_id == game['home_team_id'] else game['home_team_id'],
+				'player_id': player_id,
+				'jersey_number': contract['jersey_number'],
+				'role': player['role'],
+			})
 
-	def get_debug_url(self):
-		if 'pbp_url' in self.current_game:
-			return self.current_game['pbp_url']
-		else:
-			return self.current_game['website_id']
+		return teams, players
 
-	def clean_actions(self, raw_actions):
+	def clean_actions(self, raw_actions: ActionBatch, context: GameContext, live: LiveGame = None):
 		# TODO: insert player logic (previous from get_game_data)
+		# the actions of a game in progress continue the numbering and the linking of its previous polls
 
-		action_number = 1
-		actions = []
+		action_number = live.action_number if live is not None else 1
+		actions = ActionBatch(ACTION_SCHEMA)
+		append = actions.append
 
-		game = self.current_game
+		game = context.game
+		edition = context.edition
 
-		pending_actions = dict()
+		season_id = edition['season_id']
+		edition_id = edition['edition_id']
+		game_id = game['game_id']
+		home_team = game['home_team'].title()
+		away_team = game['away_team'].title()
 
-		for raw_action in raw_actions:
-			action = {
-				'season_id': self.current_edition['season_id'],
-				'edition_id': self.current_edition['edition_id'],
-				'game_id': game['game_id'],
-				'action_number': None,
-				'period': None,
-				'home_score': None,
-				'away_score': None,
-				'remaining_period_time': None,
-				'type': None,
-				'player_id': None,
-				'team_id': None,
-				'opponent_id': None,
-				'x': None,
-				'y': None,
-				'target_x': None,
-				'target_y': None,
-				'details': None,
-				'linked_action_number': None
-			}
-
-			main_type_code = raw_action['description']
+		pending_actions = live.pending_actions if live is not None else dict()
+		linking_rules = utils.LINKING_RULES
+
+		for _, period, remaining_period_time, team_name, home_score, away_score, player, player_id_website, main_type_code, flags, x, y, target_x, target_y in raw_actions.rows():
 			if main_type_code is None:
 				continue
-			period = raw_action['period']
-			# home_score = raw_action['home_score']
-			# away_score = raw_action['away_score']
-			remaining_period_time = raw_action['remaining_period_time']
 
 			team_id = None
-			team_loc = None
 
-			if raw_action['team'] is not None:
-				team_name = raw_action['team']
+			if team_name is not None:
+				team_name = team_name.title()
 
-				if team_name.title() == game['home_team'].title():
+				if team_name == home_team:
 					team_id = game['home_team_id']
-					team_loc = 'home_players'
-				elif team_name.title() == game['away_team'].title():
+				elif team_name == away_team:
 					team_id = game['away_team_id']
-					team_loc = 'away_players'
-				else:
-					team_id = None
-
-			player = raw_action['player']
 
 			if player is not None and team_id is not None:
 				player_str = f'{team_id} {player}'
 
 				if player_str not in self.players_cache:
-					player_id_website = raw_action['player_id']
-
-					player, contract = self.current_season['players'][player_id_website]
-
-					contract['season_id'] = self.current_season['season_id']
-					contract['team_id'] = team_id
-
-					if 'full_name' not in player:
-						logger.error(f'Missing player\'s full name!\nPlayer is {player}')
-						exit(0)
-
-					player_id = self.writer.insert_player_and_contract(player, contract)
+					player_id = self.insert_player(context, team_id, player_id_website)
 					self.players_cache[player_str] = player_id
 				else:
 					player_id = self.players_cache[player_str]
 			else:
 				player_id = None
 
-			x = raw_action['x']
-			y = raw_action['y']
-
-			if 'target_x' not in raw_action:
-				target_x = None
-				target_y = None
-			else:
-				target_x = raw_action['target_x']
-				target_y = raw_action['target_y']
-
 			linked_action_number = None
 
 			# action details
-			flags = set(raw_action['flags'])
-			details = ':'.join(flags)
-
-			home_score = raw_action['home_score']
-			away_score = raw_action['away_score']
-
-			# types whose last possible linked action has been found, and therefore can be removed. We cannot remove them on the go since this would change the collection that we are iterating
-			general_types_to_remove = []
-			# a pending general type is an action which may be referenced by another action, and therefore we use this dict to track the id of the action to link
-			for pending_general_type in pending_actions:
-				# save link
-				if main_type_code in utils.get_referenced_types(pending_general_type):
-					linked_action_number = pending_actions[pending_general_type]
-
-				# this code must be ignored so we skip it. It's the case of substitutions between a foul and the free throws
-				if main_type_code in utils.get_ignored_types(pending_general_type):
-					continue
-
-				# last possible action, so we "close" it by removing it from the dict
-				if main_type_code in utils.get_closing_types(pending_general_type):
-					general_types_to_remove.append(pending_general_type)
-
-				# if we did not reference, nor ignore nor close an action it means that something that we imagined could have happened did not happen. Therefore, we remove it.
-				# Before removing it, we check if we are in the peculiar cases in which a team rebound or a team steal happened, since these are not tracked.
-				if main_type_code not in utils.get_referenced_types(
-						pending_general_type) and main_type_code not in utils.get_closing_types(pending_general_type):
-
-					general_types_to_remove.append(pending_general_type)
-
-			for general_type_to_remove in general_types_to_remove:
-				pending_actions.pop(general_type_to_remove)
-
-			if team_id == self.current_game['away_team_id']:
-				opponent_team_id = self.current_game['home_team_id']
-			elif team_id == self.current_game['home_team_id']:
-				opponent_team_id = self.current_game['away_team_id']
+			details = ':'.join(set(flags))
+
+			# a pending general type is an action which may be referenced by another action, and therefore we use this dict to track the id of the action to link.
+			# The precompiled rules tell whether the current action references each pending type, and whether the pending type can still be referenced afterwards:
+			# it cannot when its last possible linked action has been found, nor when something that we imagined could have happened did not happen
+			if pending_actions:
+				general_types_to_remove = []
+				for pending_general_type, pending_action_number in pending_actions.items():
+					links, keeps = linking_rules.get((pending_general_type, main_type_code), utils.NO_LINK)
+
+					if links:
+						linked_action_number = pending_action_number
+
+					if not keeps:
+						general_types_to_remove.append(pending_general_type)
+
+				for general_type_to_remove in general_types_to_remove:
+					pending_actions.pop(general_type_to_remove)
+
+			if team_id == game['away_team_id']:
+				opponent_team_id = game['home_team_id']
+			elif team_id == game['home_team_id']:
+				opponent_team_id = game['away_team_id']
 			else:
 				opponent_team_id = None
 
-			action['action_number'] = action_number
-			action['period'] = period
-			action['home_score'] = home_score
-			action['away_score'] = away_score
-			action['remaining_period_time'] = remaining_period_time
-			action['type'] = main_type_code
-			action['player_id'] = player_id
-			action['team_id'] = team_id
-			action['opponent_id'] = opponent_team_id
-			action['x'] = x
-			action['y'] = y
-			action['target_x'] = target_x
-			action['target_y'] = target_y
-			action['details'] = details
-			action['linked_action_number'] = linked_action_number
-
-			actions.append(action)
-
-			action_general_type = utils.get_general_type(main_type_code, flags)
+			append(season_id, edition_id, game_id, action_number, period, home_score, away_score, remaining_period_time, main_type_code,
+			       player_id, team_id, opponent_team_id, x, y, target_x, target_y, details, linked_action_number)
+
+			action_general_type = utils.GENERAL_TYPES.get(main_type_code)
 			if action_general_type:
 				pending_actions[action_general_type] = action_number
 
 			action_number += 1
 
+		if live is not None:
+			live.action_number = action_number
+
 		return actions
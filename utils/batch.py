@@ -0,0 +1,111 @@
+import math
+from array import array
+
+# column types: 'i' is an array of C ints, 'd' an array of doubles where NaN stands for a missing value, None a list of
+# python objects
+RAW_ACTION_SCHEMA = (
+    ('action_id', None),
+    ('period', 'i'),
+    ('remaining_period_time', 'i'),
+    ('team', None),
+    ('home_score', 'i'),
+    ('away_score', 'i'),
+    ('player', None),
+    ('player_id', None),
+    ('description', None),
+    ('flags', None),
+    ('x', 'd'),
+    ('y', 'd'),
+    ('target_x', 'd'),
+    ('target_y', 'd'),
+)
+
+ACTION_SCHEMA = (
+    ('season_id', None),
+    ('edition_id', None),
+    ('game_id', None),
+    ('action_number', 'i'),
+    ('period', 'i'),
+    ('home_score', 'i'),
+    ('away_score', 'i'),
+    ('remaining_period_time', 'i'),
+    ('type', None),
+    ('player_id', None),
+    ('team_id', None),
+    ('opponent_id', None),
+    ('x', 'd'),
+    ('y', 'd'),
+    ('target_x', 'd'),
+    ('target_y', 'd'),
+    ('details', None),
+    ('linked_action_number', None),
+)
+
+NUMPY_TYPES = {
+    'i': 'int32',
+    'd': 'float64',
+}
+
+
+class ActionBatch:
+    # the actions of a game stored column by column, instead of as one dict per action
+    __slots__ = ('schema', 'names', 'columns', 'appenders')
+
+    def __init__(self, schema=ACTION_SCHEMA):
+        self.schema = schema
+        self.names = tuple(name for name, _ in schema)
+        self.columns = {name: array(typecode) if typecode else [] for name, typecode in schema}
+        self.appenders = tuple(self.get_appender(name, typecode) for name, typecode in schema)
+
+    def get_appender(self, name, typecode):
+        append = self.columns[name].append
+        if typecode != 'd':
+            return append
+
+        nan = math.nan
+
+        def append_float(value):
+            append(nan if value is None else value)
+
+        return append_float
+
+    def append(self, *values):
+        # values are in schema order
+        for append, value in zip(self.appenders, values):
+            append(value)
+
+    def __len__(self):
+        return len(self.columns[self.names[0]])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def rows(self, names=None):
+        if names is None:
+            names = self.names
+
+        return zip(*(self.columns[name] for name in names))
+
+    def to_arrow(self, schema=None):
+        import numpy as np
+        import pyarrow as pa
+
+        arrays = []
+        for name, typecode in self.schema:
+            field_type = schema.field(name).type if schema is not None else None
+
+            if typecode:
+                # NaNs become nulls, the data buffer is not copied
+                values = pa.array(np.frombuffer(self.columns[name], dtype=NUMPY_TYPES[typecode]), from_pandas=True)
+                if field_type is not None and values.type != field_type:
+                    values = values.cast(field_type)
+            else:
+                values = pa.array(self.columns[name], type=field_type)
+
+            arrays.append(values)
+
+        table = pa.Table.from_arrays(arrays, names=list(self.names))
+        if schema is not None:
+            table = table.select(schema.names).cast(schema)
+
+        return table
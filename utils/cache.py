@@ -0,0 +1,62 @@
+import hashlib
+import json
+import logging
+import os
+import time
+logger = logging.getLogger('waterpolo')
+
+
+class ResponseCache:
+    # on-disk cache of JSON responses. Each entry is stored in its own file, whose name is the hash of the request url
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def get_path(self, url: str):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f'{digest}.json')
+
+    def get(self, url: str):
+        path = self.get_path(url)
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f'Corrupted cache entry {path} for {url}, ignoring it')
+            return None
+
+        if entry['expires_at'] is not None and entry['expires_at'] < time.time():
+            return None
+
+        return entry['payload']
+
+    def get_entry(self, url: str):
+        # the stored entry even if it expired, so that it can be revalidated with a conditional request
+        try:
+            with open(self.get_path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set(self, url: str, payload, ttl=None, etag=None, last_modified=None, size=None):
+        path = self.get_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        now = time.time()
+        entry = {
+            'url': url,
+            'stored_at': now,
+            'expires_at': None if ttl is None else now + ttl,
+            'etag': etag,
+            'last_modified': last_modified,
+            'size': size,
+            'payload': payload,
+        }
+
+        # write to a temporary file first, so that a concurrent reader never sees a partial entry
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
@@ -12,6 +12,7 @@ UNMATCHED_GAME = 10
 UNMATCHED_TEAM = 11
 UNMATCHED_PLAYER = 12
 UNSUPPORTED_WRITER = 13
+FAILED_SEASONS = 14
 
 PLAYED = 'played'
 SCHEDULED = 'scheduled'
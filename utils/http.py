@@ -0,0 +1,22 @@
+import logging
+import random
+logger = logging.getLogger('waterpolo')
+
+# seconds to open a connection and to wait for the next bytes of a response
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+
+MAX_ATTEMPTS = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    # without brotli neither requests nor aiohttp can decode br responses, so they must not be asked for
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def get_backoff(attempt: int, factor=1.0, maximum=60.0):
+    # exponential backoff with full jitter, so that the requests that failed together are not repeated together
+    return random.uniform(0, min(maximum, factor * 2 ** attempt))
@@ -0,0 +1,39 @@
+import json
+import logging
+import os
+logger = logging.getLogger('waterpolo')
+
+
+class Manifest:
+    # the games of a season that have already been written, with the status they had when they were written. A game is
+    # downloaded again only if it is new or its status changed
+    def __init__(self, path: str):
+        self.path = path
+        self.games = dict()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.games = json.load(f)['games']
+        except FileNotFoundError:
+            self.games = dict()
+        except (KeyError, ValueError):
+            logger.warning(f'Corrupted manifest {self.path}, every game of the season will be downloaded again')
+            self.games = dict()
+
+    def is_up_to_date(self, website_id, status):
+        return self.games.get(str(website_id)) == status
+
+    def mark(self, website_id, status):
+        self.games[str(website_id)] = status
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'games': self.games}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,203 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# counters and histograms of a run, such as the time spent in every stage or the requests made to the API. Every thread
+# of the run records into the same registry, which is written at the end as json and as a Prometheus textfile
+PREFIX = 'waterpolo'
+
+# upper bounds in seconds, the last bucket being +Inf
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'stage_seconds': 'Time spent in every stage of the scrape',
+    'request_seconds': 'Latency of the requests to the arena API',
+    'requests_total': 'Requests to the arena API by route and status',
+    'response_bytes_total': 'Bytes received from the arena API, once decompressed',
+    'wire_bytes_total': 'Bytes received from the arena API, as transferred',
+    'saved_bytes_total': 'Bytes not transferred thanks to the low bandwidth mode',
+    'skipped_requests_total': 'Requests avoided by the low bandwidth mode',
+    'cache_requests_total': 'Lookups in the responses cache',
+    'roster_cache_total': 'Lookups of the rosters already parsed in the season',
+    'games_total': 'Games downloaded',
+    'actions_total': 'Actions written',
+}
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = dict()
+        self.histograms = dict()
+        self.started_at = time.time()
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def get_counter(self, name, **labels):
+        # the sum over every series of the counter that has the given labels
+        with self.lock:
+            return sum(value for (counter, series), value in self.counters.items()
+                       if counter == name and labels.items() <= dict(series).items())
+
+    def get_summary(self):
+        with self.lock:
+            stages = {dict(series)['stage']: {'count': histogram.count, 'seconds': histogram.sum}
+                      for (name, series), histogram in self.histograms.items() if name == 'stage_seconds'}
+
+        hits = self.get_counter('cache_requests_total', result='hit')
+        lookups = self.get_counter('cache_requests_total')
+
+        return {
+            'elapsed': time.time() - self.started_at,
+            'stages': stages,
+            'requests': self.get_counter('requests_total'),
+            'response_bytes': self.get_counter('response_bytes_total'),
+            'cache_hit_rate': hits / lookups if lookups else None,
+            'games': self.get_counter('games_total'),
+            'actions': self.get_counter('actions_total'),
+        }
+
+    def to_dict(self):
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(series), 'value': value} for (name, series), value in self.counters.items()]
+            histograms = [{'name': name, 'labels': dict(series), 'counts': list(histogram.counts), 'sum': histogram.sum,
+                           'count': histogram.count} for (name, series), histogram in self.histograms.items()]
+
+        return {
+            'buckets': list(BUCKETS),
+            'counters': counters,
+            'histograms': histograms,
+            'summary': self.get_summary(),
+        }
+
+    def merge(self, content: dict):
+        # adds the metrics of another registry, as returned by to_dict (e.g. those of another process)
+        with self.lock:
+            for counter in content['counters']:
+                key = (counter['name'], tuple(sorted(counter['labels'].items())))
+                self.counters[key] = self.counters.get(key, 0) + counter['value']
+
+            for entry in content['histograms']:
+                key = (entry['name'], tuple(sorted(entry['labels'].items())))
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram()
+                histogram = self.histograms[key]
+                histogram.counts = [a + b for a, b in zip(histogram.counts, entry['counts'])]
+                histogram.sum += entry['sum']
+                histogram.count += entry['count']
+
+    def to_prometheus(self):
+        lines = []
+
+        with self.lock:
+            counters = sorted(self.counters.items(), key=lambda item: str(item[0]))
+            histograms = sorted(self.histograms.items(), key=lambda item: str(item[0]))
+
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f'# HELP {PREFIX}_{name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {PREFIX}_{name} counter')
+            for (counter, series), value in counters:
+                if counter == name:
+                    lines.append(f'{PREFIX}_{name}{format_labels(series)} {value}')
+
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f'# HELP {PREFIX}_{name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {PREFIX}_{name} histogram')
+            for (histogram_name, series), histogram in histograms:
+                if histogram_name != name:
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}_{name}_bucket{format_labels(series + (("le", bound),))} {cumulative}')
+                lines.append(f'{PREFIX}_{name}_sum{format_labels(series)} {histogram.sum}')
+                lines.append(f'{PREFIX}_{name}_count{format_labels(series)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        # path.json and path.prom are written, replacing the extension of path if any
+        base, extension = os.path.splitext(path)
+        if extension not in ('.json', '.prom'):
+            base = path
+
+        write_file(f'{base}.json', json.dumps(self.to_dict(), indent=1))
+        write_file(f'{base}.prom', self.to_prometheus())
+
+
+def format_labels(series):
+    if not series:
+        return ''
+
+    labels = ','.join(f'{key}="{str(value)}"' for key, value in series)
+    return f'{{{labels}}}'
+
+
+def write_file(path, content):
+    # textfile collectors may read the file at any time, so it is replaced at once
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def reset():
+    global _metrics
+    _metrics = Metrics()
+
+
+def count(name, value=1, **labels):
+    _metrics.count(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    _metrics.observe(name, value, **labels)
+
+
+def timer(stage):
+    return _metrics.timer(stage)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+logger = logging.getLogger('waterpolo')
+
+# the responses that mean the server wants us to slow down
+THROTTLING_STATUSES = (429, 503)
+
+
+class RateLimiter:
+    # a token bucket shared by every request of the run, with a cap on the requests in flight. Both the rate and the cap
+    # follow AIMD: they grow a little with every successful response and are halved when the server throttles us, whose
+    # Retry-After pauses every request. It must be used from a single event loop
+    def __init__(self, rate=20.0, burst=None, max_concurrency=8, min_rate=0.5, min_concurrency=1, increase=None,
+                 decrease=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.min_rate = min(min_rate, rate)
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        # by default, 20 successful responses in a row bring the rate back from its minimum to its maximum
+        self.increase = increase if increase is not None else rate / 20
+        self.decrease = decrease
+        self.in_flight = 0
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.decreased_at = 0.0
+        self.throttled = 0
+        self.released = None
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        # waits until a request can be sent, and returns when it was sent
+        if self.released is None:
+            self.released = asyncio.Event()
+
+        while True:
+            now = time.monotonic()
+            self.refill(now)
+
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+            elif self.in_flight >= int(self.concurrency):
+                self.released.clear()
+                await self.released.wait()
+            elif self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+            else:
+                self.tokens -= 1
+                self.in_flight += 1
+                return now
+
+    def release(self, sent_at, status=None, retry_after=None):
+        # status is None when the request failed without a response
+        self.in_flight -= 1
+        self.released.set()
+
+        now = time.monotonic()
+        if status in THROTTLING_STATUSES:
+            self.throttled += 1
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            # the requests sent before the last decrease were throttled for the same reason, so they do not decrease
+            # again
+            if sent_at > self.decreased_at:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease)
+                self.tokens = min(self.tokens, 0)
+                self.decreased_at = now
+                logger.info(f'Throttled by the server ({status}), slowing down to {self.rate:.1f} requests/s '
+                            f'and {int(self.concurrency)} connections')
+        elif status is not None and status < 500:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def get_state(self):
+        # may be called from another thread, so it does not refill the bucket itself
+        now = time.monotonic()
+
+        return {
+            'rate': self.rate,
+            'max_rate': self.max_rate,
+            'concurrency': int(self.concurrency),
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'tokens': min(self.burst, self.tokens + (now - self.updated_at) * self.rate),
+            'backoff': max(0.0, self.blocked_until - now),
+            'throttled': self.throttled,
+        }
+
+
+def get_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -1,32 +1,45 @@
+import functools
+import logging
 import re
-import requests
-from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3 import Retry
+import time
+from unidecode import unidecode
 from utils.constants import *
+logger = logging.getLogger('waterpolo')
 
 
 def get_soup(url: str, headers=None, params=None, verify=True):
-    requests.packages.urllib3.disable_warnings()
-    session = requests.Session()
-    retry = Retry(connect=10, backoff_factor=2)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    try:
-        response = requests.get(url, headers=headers, params=params, verify=verify).text
-        soup = BeautifulSoup(response, 'lxml')
-        counter = 0
-        while soup is None and counter < 10:
-            response = session.get(url, headers=headers, params=params, verify=verify).text
-            soup = BeautifulSoup(response, 'lxml')
-            counter += 1
-        return soup
-    except requests.exceptions.ChunkedEncodingError as e:
-        return None
-    except Exception as e:
-        print(e)
-        return None
+    # pages that cannot be downloaded, even after http.MAX_ATTEMPTS attempts, are None. requests and bs4 are only imported
+    # by the scrapers that download pages
+    import requests
+    from bs4 import BeautifulSoup
+    from utils import http
+
+    if not verify:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    headers = {'Accept-Encoding': http.ACCEPT_ENCODING} | (headers or dict())
+    problem = None
+
+    for attempt in range(1, http.MAX_ATTEMPTS + 1):
+        try:
+            response = requests.get(url, headers=headers, params=params, verify=verify,
+                                    timeout=(http.CONNECT_TIMEOUT, http.READ_TIMEOUT))
+            if response.status_code not in http.RETRY_STATUSES:
+                response.raise_for_status()
+                return BeautifulSoup(response.text, 'lxml')
+            problem = f'answered {response.status_code}'
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            problem = f'failed with {type(e).__name__} {e}'
+        except requests.exceptions.RequestException as e:
+            logger.warning(f'Could not download {url}: {e}')
+            return None
+
+        if attempt < http.MAX_ATTEMPTS:
+            time.sleep(http.get_backoff(attempt))
+
+    logger.warning(f'Could not download {url}: {problem} after {http.MAX_ATTEMPTS} attempts')
+    return None
 
 
 def isfloat(num):
@@ -37,65 +50,83 @@ def isfloat(num):
         return False
 
 
-def is_soup_valid(soup: BeautifulSoup):
+def is_soup_valid(soup):
     return not soup.find('div', class_='alert')
 
 
+GENERAL_TYPES = {
+    GOAL: 'goal',
+    MISS: 'miss',
+    EXCLUSION: 'foul',
+    TURNOVER: 'turnover',
+    SWIM_OFF_WON: 'swimoff',
+}
+
+# the types of action that may be linked to a pending general type
+REFERENCED_TYPES = {
+    'goal': frozenset({ASSIST, SAVE}),
+    'miss': frozenset({BLOCK, SAVE}),
+    'turnover': frozenset({STEAL}),
+    'foul': frozenset({FOUL_DRAWN}),
+    'swimoff': frozenset({SWIM_OFF_LOST}),
+}
+
+# the types of action after which a pending general type cannot be referenced anymore
+CLOSING_TYPES = {
+    'goal': frozenset(),
+    'miss': frozenset(),
+    'turnover': frozenset({STEAL}),
+    'foul': frozenset({FOUL_DRAWN}),
+    'swimoff': frozenset({SWIM_OFF_LOST}),
+}
+
+# the types of action that can happen between a pending general type and the action referencing it
+IGNORED_TYPES = {
+    'goal': frozenset(),
+    'miss': frozenset(),
+    'turnover': frozenset(),
+    'foul': frozenset(),
+    'swimoff': frozenset(),
+}
+
+
 def get_general_type(action_type: str, flags: set):
-    if action_type in [GOAL]:
-        return 'goal'
-    elif action_type in [MISS]:
-        return 'miss'
-    elif action_type == EXCLUSION:
-        return 'foul'
-    elif action_type == TURNOVER:
-        return 'turnover'
-    elif action_type == SWIM_OFF_WON:
-        return 'swimoff'
-    else:
-        return
+    return GENERAL_TYPES.get(action_type)
 
 
 def get_referenced_types(general_type):
-    types_map = {
-        'goal': {ASSIST, SAVE},
-        'miss': {BLOCK, SAVE},
-        'turnover': {STEAL},
-        'foul': {FOUL_DRAWN},
-        'swimoff': {SWIM_OFF_LOST},
-    }
-    if general_type in types_map:
-        return types_map[general_type]
-    else:
-        return {}
+    return REFERENCED_TYPES.get(general_type, frozenset())
 
 
 def get_closing_types(general_type):
-    types_map = {
-        'goal': {},
-        'miss': {},
-        'turnover': {STEAL},
-        'foul': {FOUL_DRAWN},
-        'swimoff': {SWIM_OFF_LOST},
-    }
-    if general_type in types_map:
-        return types_map[general_type]
-    else:
-        return {}
+    return CLOSING_TYPES.get(general_type, frozenset())
 
 
 def get_ignored_types(general_type):
-    types_map = {
-        'goal': {},
-        'miss': {},
-        'turnover': {},
-        'foul': {},
-        'swimoff': {},
-    }
-    if general_type in types_map:
-        return types_map[general_type]
-    else:
-        return {}
+    return IGNORED_TYPES.get(general_type, frozenset())
+
+
+def compile_linking_rules():
+    # (pending general type, action type) -> (whether the action links to the pending one, whether the pending one is
+    # still pending afterwards). Pairs that are not in the table neither link nor keep the pending type
+    rules = dict()
+
+    for general_type in REFERENCED_TYPES:
+        referenced = get_referenced_types(general_type)
+        closing = get_closing_types(general_type)
+        ignored = get_ignored_types(general_type)
+
+        for action_type in referenced | closing | ignored:
+            links = action_type in referenced
+            keeps = action_type in ignored or (links and action_type not in closing)
+            rules[(general_type, action_type)] = (links, keeps)
+
+    return rules
+
+
+LINKING_RULES = compile_linking_rules()
+
+NO_LINK = (False, False)
 
 
 def strings_similarity(name: str, target: str):
@@ -127,6 +158,68 @@ def split_name_and_middle_name(name_1: str, name_2: str):
     return name, middle_name
 
 
+# enough for the players of a full historical rebuild, whose rosters repeat in every game of a season
+CLEAN_NAME_CACHE_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=CLEAN_NAME_CACHE_SIZE)
+def clean_name(name: str):
+    if name is None:
+        return None
+
+    def uppercase_nth_char(string, index):
+        return string[:index] + string[index].upper() + string[index + 1:]
+
+    name = unidecode(name)
+
+    # remove punctuation marks
+    for char in ('.', ','):
+        name = name.replace(char, '')
+
+    # replace apostrophes
+    for char in ('"', '’', "''"):
+        name = name.replace(char, "'")
+
+    new_name_split = list()
+
+    for split_temp in name.split():
+        split_temp = split_temp.title()
+
+        if split_temp.startswith('Mc') and len(split_temp) > 2:
+            split_temp = uppercase_nth_char(split_temp, 2)
+
+        if split_temp in ('Ii', 'Iii', 'Iv'):
+            split_temp = split_temp.upper()
+
+        new_name_split.append(split_temp)
+
+    name = ' '.join(new_name_split)
+
+    for string_to_remove in (' III', ' II', ' IV', ' Jr', ' Sr'):
+        name = name.replace(string_to_remove, '').strip()
+
+    return name
+
+
+def clean_names(names):
+    # a whole roster at once: every distinct name is normalized only once
+    cleaned = {name: clean_name(name) for name in set(names)}
+    return [cleaned[name] for name in names]
+
+
+def get_clean_name_stats():
+    info = clean_name.cache_info()
+    lookups = info.hits + info.misses
+
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_rate': info.hits / lookups if lookups else None,
+    }
+
+
 def is_name_the_same(name_1: str, name_2: str):
     return is_name_fully_contained(name_1, name_2) or is_name_fully_contained(name_2, name_1)
 
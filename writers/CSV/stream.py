@@ -0,0 +1,90 @@
+import csv
+import math
+import os
+from array import array
+from datetime import datetime, time
+
+
+class CSVStream:
+    # an output file kept open for the whole season. Rows go through a large write buffer, which is flushed to disk when
+    # it is full or when the stream is closed
+    def __init__(self, filename: str, columns: list, separator=',', buffer_size=1 << 20):
+        self.filename = filename
+        self.columns = columns
+
+        directory = os.path.dirname(filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        is_new = not os.path.isfile(filename)
+        self.file = open(filename, 'a', newline='', buffering=buffer_size)
+        # the same dialect pandas uses, so that files written by previous versions can be appended to
+        self.writer = csv.writer(self.file, delimiter=separator, lineterminator=os.linesep)
+
+        if is_new:
+            self.writer.writerow(columns)
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def format_value(value):
+    # how pandas writes a single value of a one-row dataframe
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return '' if math.isnan(value) else repr(value)
+    if isinstance(value, datetime) and value.tzinfo is None and value.time() == time():
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def format_columns(columns, float_format='%.3f', decimal='.', fixed_floats=False):
+    # how pandas writes a batch of rows after convert_dtypes: numeric columns whose values are all integers are written as
+    # integers, the other numeric columns with float_format. Missing values are None or NaN. With fixed_floats, the float
+    # arrays are always written with float_format, whatever the values of the batch
+    formatted = []
+
+    for values in columns:
+        if isinstance(values, array) and values.typecode != 'd':
+            formatted.append(values)
+            continue
+        if fixed_floats and isinstance(values, array):
+            formatted.append(['' if value != value else (float_format % value).replace('.', decimal) for value in values])
+            continue
+
+        has_float = False
+        is_integer = True
+        is_numeric = True
+
+        for value in values:
+            if value is None:
+                continue
+            if isinstance(value, float):
+                has_float = True
+                if math.isnan(value):
+                    continue
+                if not value.is_integer():
+                    is_integer = False
+            elif isinstance(value, bool) or not isinstance(value, int):
+                is_numeric = False
+                break
+
+        if not is_numeric or not has_float:
+            formatted.append([format_value(value) for value in values])
+        elif is_integer:
+            formatted.append(['' if value is None or value != value else int(value) for value in values])
+        else:
+            formatted.append(['' if value is None or value != value else (float_format % value).replace('.', decimal)
+                              for value in values])
+
+    return formatted
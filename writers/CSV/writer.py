@@ -1,11 +1,37 @@
+import csv
 import logging
 import os
-import numpy as np
-import pandas as pd
 from writers.writer import Writer as Abstract
+from utils.batch import ActionBatch
+from writers.CSV.stream import CSVStream, format_columns, format_value
 from utils.constants import *
 logger = logging.getLogger('sdeng')
 
+GAMES_COLUMNS = ['season_id', 'edition_id', 'game_id', 'website_id', 'date', 'round',
+                 'status', 'home_team_id', 'away_team_id', 'home_score', 'away_score']
+
+TEAMS_COLUMNS = ['team_id', 'franchise_id', 'season_id', 'conference', 'gender', 'category', 'name', 'abbreviation', 'logo_url', 'color']
+
+ROSTERS_COLUMNS = ['player_id', 'name', 'surname', 'full_name', 'birthday', 'role', 'height', 'weight', 'hand', 'team_id', 'season_id', 'jersey_number',
+                   'picture_url']
+
+ACTIONS_COLUMNS = ['season_id', 'edition_id', 'game_id', 'action_number', 'period', 'home_score', 'away_score', 'remaining_period_time',
+                   'type', 'player_id', 'team_id', 'opponent_id', 'x', 'y', 'target_x', 'target_y', 'details', 'linked_action_number']
+
+TEAM_BOXSCORES_COLUMNS = ['season_id', 'edition_id', 'game_id', 'team_id', 'opponent_id', 'home', 'goals', 'goals_against', 'result']
+
+PLAYER_BOXSCORES_COLUMNS = ['season_id', 'edition_id', 'game_id', 'team_id', 'opponent_id', 'player_id', 'jersey_number', 'role']
+
+# the columns identifying a row of each file, used to drop the rows written again by a later run in append mode. The
+# play-by-play of a game written again replaces all its previous rows instead
+UNIQUE_KEYS = {
+    'games.csv': ['game_id'],
+    'teams.csv': ['team_id'],
+    'rosters.csv': ['player_id', 'team_id'],
+    'team_boxscores.csv': ['game_id', 'team_id'],
+    'player_boxscores.csv': ['game_id', 'team_id', 'player_id'],
+}
+
 
 class Writer(Abstract):
 
@@ -16,9 +42,17 @@ class Writer(Abstract):
         self.league_dir_path = None
         self.file_separator = ','
         self.decimal_separator = '.'
+        self.buffer_size = 1 << 20
         self.players = dict()
         self.contracts = dict()
         self.append = 'append' in kwargs and kwargs['append']
+        self.existing_files = set()
+        self.game_ids = set()
+        # the rows written to the play-by-play in the season, and for each game written in full, the row where its last
+        # actions start
+        self.action_rows = 0
+        self.action_starts = dict()
+        self.streams = dict()
 
         if 'dir' in kwargs:
             self.raw_dir_path = kwargs['dir']
@@ -29,17 +63,41 @@ class Writer(Abstract):
         if 'csv_decimal_separator' in kwargs:
             self.decimal_separator = kwargs['csv_decimal_separator']
 
+        if 'csv_buffer_size' in kwargs:
+            self.buffer_size = kwargs['csv_buffer_size']
+
+    def get_stream(self, filename, columns):
+        if filename not in self.streams:
+            self.streams[filename] = CSVStream(os.path.join(self.dir_path, filename), columns, separator=self.file_separator,
+                                               buffer_size=self.buffer_size)
+
+        return self.streams[filename]
+
+    def close_streams(self):
+        for stream in self.streams.values():
+            stream.close()
+
+        self.streams = dict()
+
     def check_and_insert_league(self, content: dict):
         self.league_dir_path = os.path.join(self.raw_dir_path, content['name'])
         return content['name']
 
     def check_and_insert_season(self, content: dict):
+        self.close_streams()
+
         season_code = f'{content["start"]%100:02d}-{content["end"]%100:02d}'
         self.dir_path = os.path.join(self.league_dir_path, season_code)
 
+        self.existing_files = set()
+        self.game_ids = set()
+        self.action_rows = 0
+        self.action_starts = dict()
         if os.path.exists(self.dir_path) and not self.append:
             for f in os.listdir(self.dir_path):
                 os.remove(os.path.join(self.dir_path, f))
+        elif os.path.exists(self.dir_path):
+            self.existing_files = set(os.listdir(self.dir_path))
 
         return season_code
 
@@ -47,53 +105,31 @@ class Writer(Abstract):
         return f'{content["season_id"]} {content["league_id"]}'
 
     def check_and_insert_game(self, content: dict):
-        if not os.path.exists(self.dir_path):
-            os.makedirs(self.dir_path)
-
-        filename = os.path.join(self.dir_path, 'games.csv')
-
         if not content:
             return
 
-        columns_order = ['season_id', 'edition_id', 'game_id', 'website_id', 'date', 'round',
-                         'status', 'home_team_id', 'away_team_id', 'home_score', 'away_score']
-
         game_id = f'{content["date"].date()}:{content["home_team_id"]}-{content["away_team_id"]}'
         content['game_id'] = game_id
 
-        df = pd.DataFrame([content])
-        df = df[columns_order]
+        if game_id in self.game_ids:
+            # a game written again in the same season (e.g. once in progress and once over) keeps only its last row
+            self.existing_files.add('games.csv')
+        self.game_ids.add(game_id)
 
-        if not os.path.exists(filename):
-            df.to_csv(filename, index=False, sep=self.file_separator)
-        else:
-            df.to_csv(filename, index=False, sep=self.file_separator, mode='a', header=False)
+        self.get_stream('games.csv', GAMES_COLUMNS).write_row([format_value(content[column]) for column in GAMES_COLUMNS])
 
         return game_id
 
     def check_and_insert_team(self, content: dict):
-        if not os.path.exists(self.dir_path):
-            os.makedirs(self.dir_path)
-
-        filename = os.path.join(self.dir_path, 'teams.csv')
-
         if not content:
             return
 
-        columns_order = ['team_id', 'franchise_id', 'season_id', 'conference', 'gender', 'category', 'name', 'abbreviation', 'logo_url', 'color']
-
         content['team_id'] = content['name']
 
         if 'conference' not in content:
             content['conference'] = None
 
-        df = pd.DataFrame([content])
-        df = df[columns_order].drop_duplicates()
-
-        if not os.path.exists(filename):
-            df.to_csv(filename, index=False, sep=self.file_separator)
-        else:
-            df.to_csv(filename, index=False, sep=self.file_separator, mode='a', header=False)
+        self.get_stream('teams.csv', TEAMS_COLUMNS).write_row([format_value(content[column]) for column in TEAMS_COLUMNS])
 
         return content["name"]
 
@@ -103,32 +139,38 @@ class Writer(Abstract):
     def check_and_insert_edition_participant(self, content: dict):
         return None
 
-    def check_and_insert_actions(self, actions):
-        if not os.path.exists(self.dir_path):
-            os.makedirs(self.dir_path)
+    def check_and_insert_actions(self, actions: ActionBatch):
+        if not actions:
+            return
 
-        filename = os.path.join(self.dir_path, 'play_by_play.csv')
+        self.replace_actions(actions)
+        self.write_actions(actions)
 
+    def append_actions(self, actions: ActionBatch, replace=False):
         if not actions:
             return
+        if replace:
+            self.replace_actions(actions)
 
-        df = pd.DataFrame(actions)
+        # the actions of the game are written piece by piece, so every piece formats its float columns the same way
+        self.write_actions(actions, fixed_floats=True)
 
-        df = df.convert_dtypes()
-        s = df.select_dtypes(include='Float64').columns
-        df[s] = df[s].astype("float")
+    def replace_actions(self, actions: ActionBatch):
+        # the actions replace those already written for their games
+        for i, game_id in enumerate(actions['game_id']):
+            if self.action_starts.get(game_id, -1) < self.action_rows:
+                if game_id in self.action_starts:
+                    self.existing_files.add('play_by_play.csv')
+                self.action_starts[game_id] = self.action_rows + i
 
-        if not os.path.isfile(filename):
-            df.to_csv(filename, header=True, index=False, float_format='%.3f', sep=self.file_separator, decimal=self.decimal_separator)
-        else:
-            df.to_csv(filename, mode='a', header=False, index=False, float_format='%.3f', sep=self.file_separator, decimal=self.decimal_separator)
+    def write_actions(self, actions: ActionBatch, fixed_floats=False):
+        columns = format_columns([actions[column] for column in ACTIONS_COLUMNS], float_format='%.3f', decimal=self.decimal_separator,
+                                 fixed_floats=fixed_floats)
 
-    def insert_player_and_contract(self, player, contract):
-        if not os.path.exists(self.dir_path):
-            os.makedirs(self.dir_path)
-
-        filename = os.path.join(self.dir_path, 'rosters.csv')
+        self.get_stream('play_by_play.csv', ACTIONS_COLUMNS).write_rows(zip(*columns))
+        self.action_rows += len(actions)
 
+    def insert_player_and_contract(self, player, contract):
         if not player or not contract:
             return
         if 'name' not in player or 'surname' not in player:
@@ -139,17 +181,83 @@ class Writer(Abstract):
         player['player_id'] = player_id
         contract['player_id'] = player_id
 
-        df = pd.DataFrame([player | contract])
+        row = player | contract
+
+        self.get_stream('rosters.csv', ROSTERS_COLUMNS).write_row([format_value(row[column]) for column in ROSTERS_COLUMNS])
+
+        return player_id
 
-        columns_order = ['player_id', 'name', 'surname', 'full_name', 'birthday', 'role', 'height', 'weight', 'hand', 'team_id', 'season_id', 'jersey_number',
-                         'picture_url']
+    def insert_boxscores(self, teams: list, players: list):
+        self.get_stream('team_boxscores.csv', TEAM_BOXSCORES_COLUMNS).write_rows(
+            [format_value(row[column]) for column in TEAM_BOXSCORES_COLUMNS] for row in teams)
+        self.get_stream('player_boxscores.csv', PLAYER_BOXSCORES_COLUMNS).write_rows(
+            [format_value(row[column]) for column in PLAYER_BOXSCORES_COLUMNS] for row in players)
+
+    def flush(self):
+        for stream in self.streams.values():
+            stream.flush()
+
+    def finish_season(self):
+        self.close_streams()
+
+        # files of a previous run, or games written twice, may now contain a game, team or player twice: we keep the last
+        # version of each row
+        for f in self.existing_files:
+            if f in UNIQUE_KEYS:
+                self.drop_duplicates(os.path.join(self.dir_path, f), UNIQUE_KEYS[f])
+            elif f == 'play_by_play.csv':
+                self.drop_replaced_actions(os.path.join(self.dir_path, f))
+
+        self.existing_files = set()
+        self.action_rows = 0
+        self.action_starts = dict()
+
+    def drop_duplicates(self, filename, key_columns):
+        with open(filename, 'r', newline='') as f:
+            reader = csv.reader(f, delimiter=self.file_separator)
+            header = next(reader, None)
+            if header is None:
+                return
+
+            key_indexes = [header.index(column) for column in key_columns]
+            rows = dict()
+            total = 0
+            for row in reader:
+                rows[tuple(row[i] for i in key_indexes)] = row
+                total += 1
+
+        if len(rows) == total:
+            return
 
-        # df = df.sort_values(axis=0, by=columns_order)
-        df = df[columns_order]
+        logger.info(f'Dropping {total - len(rows)} duplicated rows from {filename}')
 
-        if not os.path.exists(filename):
-            df.to_csv(filename, index=False, sep=self.file_separator)
-        else:
-            df.to_csv(filename, index=False, sep=self.file_separator, mode='a', header=False)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=self.file_separator, lineterminator=os.linesep)
+            writer.writerow(header)
+            writer.writerows(rows.values())
 
-        return player_id
+    def drop_replaced_actions(self, filename):
+        # the rows written in the season come after those of previous runs: a game written in full in the season keeps
+        # only the rows from its last write on, those appended to it since (e.g. while in progress) included
+        with open(filename, 'r', newline='') as f:
+            reader = csv.reader(f, delimiter=self.file_separator)
+            header = next(reader, None)
+            if header is None:
+                return
+
+            rows = list(reader)
+
+        game_index = header.index('game_id')
+        first_row = len(rows) - self.action_rows
+        kept = [row for i, row in enumerate(rows)
+                if row[game_index] not in self.action_starts or i >= first_row + self.action_starts[row[game_index]]]
+
+        if len(kept) == len(rows):
+            return
+
+        logger.info(f'Dropping {len(rows) - len(kept)} replaced rows from {filename}')
+
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=self.file_separator, lineterminator=os.linesep)
+            writer.writerow(header)
+            writer.writerows(kept)
@@ -0,0 +1,201 @@
+import logging
+import os
+import sqlite3
+from utils.batch import ActionBatch
+from writers.writer import Writer as Abstract
+from utils.constants import *
+logger = logging.getLogger('sdeng')
+
+# table name -> (columns, primary key)
+TABLES = {
+    'leagues': (['league_id', 'full_name', 'website'], ['league_id']),
+    'seasons': (['season_id', 'start', 'end'], ['season_id']),
+    'editions': (['edition_id', 'league_id', 'season_id', 'number_of_teams', 'number_of_periods', 'period_duration',
+                  'shot_clock_duration', 'overtime_duration'], ['edition_id']),
+    'franchises': (['franchise_id', 'name', 'city', 'state', 'country'], ['franchise_id']),
+    'teams': (['team_id', 'season_id', 'franchise_id', 'conference', 'gender', 'category', 'name', 'abbreviation', 'logo_url',
+               'color'], ['team_id', 'season_id']),
+    'edition_participants': (['edition_id', 'team_id', 'conference'], ['edition_id', 'team_id']),
+    'games': (['game_id', 'season_id', 'edition_id', 'website_id', 'date', 'round', 'status', 'home_team_id', 'away_team_id',
+               'home_score', 'away_score'], ['game_id']),
+    'players': (['player_id', 'name', 'surname', 'full_name', 'birthday', 'role', 'height', 'weight', 'hand'], ['player_id']),
+    'contracts': (['player_id', 'team_id', 'season_id', 'jersey_number', 'picture_url'], ['player_id', 'team_id', 'season_id']),
+    'actions': (['game_id', 'action_number', 'season_id', 'edition_id', 'period', 'home_score', 'away_score',
+                 'remaining_period_time', 'type', 'player_id', 'team_id', 'opponent_id', 'x', 'y', 'target_x', 'target_y',
+                 'details', 'linked_action_number'], ['game_id', 'action_number']),
+    'team_boxscores': (['game_id', 'team_id', 'season_id', 'edition_id', 'opponent_id', 'home', 'goals', 'goals_against',
+                        'result'], ['game_id', 'team_id']),
+    'player_boxscores': (['game_id', 'player_id', 'season_id', 'edition_id', 'team_id', 'opponent_id', 'jersey_number', 'role'],
+                         ['game_id', 'team_id', 'player_id']),
+}
+
+# lookups by game_id are served by the primary keys of games and actions
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS actions_player_id ON actions (player_id)',
+    'CREATE INDEX IF NOT EXISTS actions_team_id ON actions (team_id)',
+    'CREATE INDEX IF NOT EXISTS games_season_id ON games (season_id)',
+    'CREATE INDEX IF NOT EXISTS contracts_team_id ON contracts (team_id, season_id)',
+    'CREATE INDEX IF NOT EXISTS player_boxscores_player_id ON player_boxscores (player_id)',
+]
+
+
+def get_upsert_query(table):
+    columns, key = TABLES[table]
+    updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns if column not in key)
+    conflict = 'DO NOTHING' if not updates else f'DO UPDATE SET {updates}'
+
+    names = ', '.join(f'"{column}"' for column in columns)
+    placeholders = ', '.join('?' * len(columns))
+
+    return f'INSERT INTO {table} ({names}) VALUES ({placeholders}) ON CONFLICT ({", ".join(key)}) {conflict}'
+
+
+class Writer(Abstract):
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.db_path = 'writers/SQLite3/sdeng.db'
+
+        if 'sqlite_db' in kwargs and kwargs['sqlite_db']:
+            self.db_path = kwargs['sqlite_db']
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # transactions are handled explicitly, one for each season
+        self.connection = sqlite3.connect(self.db_path, isolation_level=None, timeout=60)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('PRAGMA foreign_keys = OFF')
+        self.create_tables()
+
+        self.queries = {table: get_upsert_query(table) for table in TABLES}
+        self.league_id = None
+        self.season_id = None
+
+    def create_tables(self):
+        for table, (columns, key) in TABLES.items():
+            definition = ', '.join(f'"{column}"' for column in columns)
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({definition}, PRIMARY KEY ({", ".join(key)}))')
+
+        for index in INDEXES:
+            self.connection.execute(index)
+
+    def upsert(self, table, content: dict):
+        columns, _ = TABLES[table]
+        self.connection.execute(self.queries[table], [content.get(column) for column in columns])
+
+    def begin(self):
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN')
+
+    def commit(self):
+        if self.connection.in_transaction:
+            self.connection.execute('COMMIT')
+
+    def check_and_insert_league(self, content: dict):
+        self.league_id = content['name']
+        self.upsert('leagues', content | {'league_id': self.league_id})
+
+        return self.league_id
+
+    def check_and_insert_season(self, content: dict):
+        self.commit()
+        self.begin()
+
+        self.season_id = f'{content["start"]%100:02d}-{content["end"]%100:02d}'
+        self.upsert('seasons', content | {'season_id': self.season_id})
+
+        return self.season_id
+
+    def check_and_insert_edition(self, content: dict):
+        edition_id = f'{content["season_id"]} {content["league_id"]}'
+        self.upsert('editions', content | {'edition_id': edition_id})
+
+        return edition_id
+
+    def check_and_insert_game(self, content: dict):
+        if not content:
+            return
+
+        game_id = f'{content["date"].date()}:{content["home_team_id"]}-{content["away_team_id"]}'
+        content['game_id'] = game_id
+
+        self.upsert('games', content | {'date': content['date'].isoformat(sep=' ')})
+
+        return game_id
+
+    def check_and_insert_team(self, content: dict):
+        if not content:
+            return
+
+        content['team_id'] = content['name']
+
+        if 'conference' not in content:
+            content['conference'] = None
+
+        self.upsert('teams', content)
+
+        return content['name']
+
+    def check_and_insert_franchise(self, content: dict):
+        franchise_id = content['name']
+        self.upsert('franchises', content | {'franchise_id': franchise_id})
+
+        return franchise_id
+
+    def check_and_insert_edition_participant(self, content: dict):
+        self.upsert('edition_participants', content)
+
+        return None
+
+    def check_and_insert_actions(self, actions: ActionBatch):
+        if not actions:
+            return
+
+        columns, _ = TABLES['actions']
+        game_ids = set(actions['game_id'])
+
+        # the actions of a game are replaced as a whole, so that a game downloaded again never keeps stale actions. NaN
+        # coordinates are stored as NULL by SQLite
+        self.connection.executemany('DELETE FROM actions WHERE game_id = ?', [(game_id,) for game_id in game_ids])
+        self.connection.executemany(self.queries['actions'], actions.rows(columns))
+
+    def append_actions(self, actions: ActionBatch, replace=False):
+        if not actions:
+            return
+        if replace:
+            self.check_and_insert_actions(actions)
+            return
+
+        columns, _ = TABLES['actions']
+        self.connection.executemany(self.queries['actions'], actions.rows(columns))
+
+    def insert_player_and_contract(self, player, contract):
+        if not player or not contract:
+            return
+        if 'name' not in player or 'surname' not in player:
+            logger.error(f'Player {player["full_name"]} has no name or surname')
+            exit()
+
+        player_id = player['full_name']
+        player['player_id'] = player_id
+        contract['player_id'] = player_id
+
+        self.upsert('players', player)
+        self.upsert('contracts', contract)
+
+        return player_id
+
+    def insert_boxscores(self, teams: list, players: list):
+        for table, rows in (('team_boxscores', teams), ('player_boxscores', players)):
+            columns, _ = TABLES[table]
+            self.connection.executemany(self.queries[table], [[row.get(column) for column in columns] for row in rows])
+
+    def flush(self):
+        self.commit()
+        self.begin()
+
+    def finish_season(self):
+        self.commit()
@@ -0,0 +1,313 @@
+import logging
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from utils.batch import ActionBatch
+from writers.writer import Writer as Abstract
+from utils.constants import *
+logger = logging.getLogger('sdeng')
+
+GAMES_SCHEMA = pa.schema([
+    ('season_id', pa.string()),
+    ('edition_id', pa.string()),
+    ('game_id', pa.string()),
+    ('website_id', pa.string()),
+    ('date', pa.timestamp('s')),
+    ('round', pa.int32()),
+    ('status', pa.dictionary(pa.int8(), pa.string())),
+    ('home_team_id', pa.string()),
+    ('away_team_id', pa.string()),
+    ('home_score', pa.int32()),
+    ('away_score', pa.int32()),
+])
+
+TEAMS_SCHEMA = pa.schema([
+    ('team_id', pa.string()),
+    ('franchise_id', pa.string()),
+    ('season_id', pa.string()),
+    ('conference', pa.string()),
+    ('gender', pa.string()),
+    ('category', pa.string()),
+    ('name', pa.string()),
+    ('abbreviation', pa.string()),
+    ('logo_url', pa.string()),
+    ('color', pa.string()),
+])
+
+ROSTERS_SCHEMA = pa.schema([
+    ('player_id', pa.string()),
+    ('name', pa.string()),
+    ('surname', pa.string()),
+    ('full_name', pa.string()),
+    ('birthday', pa.date32()),
+    ('role', pa.string()),
+    ('height', pa.int32()),
+    ('weight', pa.int32()),
+    ('hand', pa.string()),
+    ('team_id', pa.string()),
+    ('season_id', pa.string()),
+    ('jersey_number', pa.int32()),
+    ('picture_url', pa.string()),
+])
+
+ACTIONS_SCHEMA = pa.schema([
+    ('season_id', pa.string()),
+    ('edition_id', pa.string()),
+    ('game_id', pa.string()),
+    ('action_number', pa.int32()),
+    ('period', pa.int32()),
+    ('home_score', pa.int32()),
+    ('away_score', pa.int32()),
+    ('remaining_period_time', pa.int32()),
+    ('type', pa.dictionary(pa.int32(), pa.string())),
+    ('player_id', pa.string()),
+    ('team_id', pa.dictionary(pa.int32(), pa.string())),
+    ('opponent_id', pa.dictionary(pa.int32(), pa.string())),
+    ('x', pa.float32()),
+    ('y', pa.float32()),
+    ('target_x', pa.float32()),
+    ('target_y', pa.float32()),
+    ('details', pa.dictionary(pa.int32(), pa.string())),
+    ('linked_action_number', pa.int32()),
+])
+
+TEAM_BOXSCORES_SCHEMA = pa.schema([
+    ('season_id', pa.string()),
+    ('edition_id', pa.string()),
+    ('game_id', pa.string()),
+    ('team_id', pa.string()),
+    ('opponent_id', pa.string()),
+    ('home', pa.bool_()),
+    ('goals', pa.int32()),
+    ('goals_against', pa.int32()),
+    ('result', pa.string()),
+])
+
+PLAYER_BOXSCORES_SCHEMA = pa.schema([
+    ('season_id', pa.string()),
+    ('edition_id', pa.string()),
+    ('game_id', pa.string()),
+    ('team_id', pa.string()),
+    ('opponent_id', pa.string()),
+    ('player_id', pa.string()),
+    ('jersey_number', pa.int32()),
+    ('role', pa.string()),
+])
+
+# the columns identifying a row of each file, used to replace the rows written again by a later run in append mode
+UNIQUE_KEYS = {
+    'games': ['game_id'],
+    'teams': ['team_id'],
+    'rosters': ['player_id', 'team_id'],
+    'play_by_play': ['game_id'],
+    'team_boxscores': ['game_id', 'team_id'],
+    'player_boxscores': ['game_id', 'team_id', 'player_id'],
+}
+
+
+class Writer(Abstract):
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.raw_dir_path = 'data'
+        self.dir_path = None
+        self.league_dir_path = None
+        self.append = 'append' in kwargs and kwargs['append']
+        # whether play-by-play row groups contain a single game or the whole season
+        self.row_groups = 'game'
+        self.games = dict()
+        self.teams = []
+        self.rosters = []
+        self.actions = []
+        # the games whose play-by-play is written in full in the season, which replaces their previous rows. The rows
+        # appended to the other games (e.g. while in progress) are added to theirs
+        self.action_games = set()
+        self.team_boxscores = []
+        self.player_boxscores = []
+        self.actions_writer = None
+        self.actions_path = None
+
+        if 'dir' in kwargs:
+            self.raw_dir_path = kwargs['dir']
+
+        if 'parquet_row_groups' in kwargs and kwargs['parquet_row_groups']:
+            self.row_groups = kwargs['parquet_row_groups']
+
+    def get_path(self, name):
+        return os.path.join(self.dir_path, f'{name}.parquet')
+
+    def check_and_insert_league(self, content: dict):
+        self.league_dir_path = os.path.join(self.raw_dir_path, content['name'])
+        return content['name']
+
+    def check_and_insert_season(self, content: dict):
+        season_code = f'{content["start"]%100:02d}-{content["end"]%100:02d}'
+        self.dir_path = os.path.join(self.league_dir_path, season_code)
+
+        if os.path.exists(self.dir_path) and not self.append:
+            for f in os.listdir(self.dir_path):
+                os.remove(os.path.join(self.dir_path, f))
+
+        self.games = dict()
+        self.teams = []
+        self.rosters = []
+        self.actions = []
+        self.action_games = set()
+        self.team_boxscores = []
+        self.player_boxscores = []
+
+        return season_code
+
+    def check_and_insert_edition(self, content: dict):
+        return f'{content["season_id"]} {content["league_id"]}'
+
+    def check_and_insert_game(self, content: dict):
+        if not content:
+            return
+
+        game_id = f'{content["date"].date()}:{content["home_team_id"]}-{content["away_team_id"]}'
+        content['game_id'] = game_id
+
+        # a game inserted again in the season (e.g. once in progress and once over) keeps only its last row
+        self.games[game_id] = {column: content[column] for column in GAMES_SCHEMA.names} | {'website_id': str(content['website_id'])}
+
+        return game_id
+
+    def check_and_insert_team(self, content: dict):
+        if not content:
+            return
+
+        content['team_id'] = content['name']
+
+        if 'conference' not in content:
+            content['conference'] = None
+
+        self.teams.append({column: content[column] for column in TEAMS_SCHEMA.names})
+
+        return content['name']
+
+    def check_and_insert_franchise(self, content: dict):
+        return content['name']
+
+    def check_and_insert_edition_participant(self, content: dict):
+        return None
+
+    def check_and_insert_actions(self, actions: ActionBatch):
+        if not actions:
+            return
+
+        self.append_actions(actions, replace=True)
+
+    def append_actions(self, actions: ActionBatch, replace=False):
+        if not actions:
+            return
+        if replace:
+            self.action_games.update(actions['game_id'])
+
+        table = actions.to_arrow(ACTIONS_SCHEMA)
+
+        if self.row_groups == 'season':
+            self.actions.append(table)
+        else:
+            self.write_actions(table)
+
+    def write_actions(self, table):
+        if self.actions_writer is None:
+            path = self.get_path('play_by_play')
+            # previous rows are merged in finish_season, so new rows go to a temporary file in the meantime
+            self.actions_path = f'{path}.{os.getpid()}.tmp' if os.path.exists(path) else path
+            os.makedirs(self.dir_path, exist_ok=True)
+            self.actions_writer = pq.ParquetWriter(self.actions_path, ACTIONS_SCHEMA)
+
+        self.actions_writer.write_table(table, row_group_size=max(table.num_rows, 1))
+
+    def insert_player_and_contract(self, player, contract):
+        if not player or not contract:
+            return
+        if 'name' not in player or 'surname' not in player:
+            logger.error(f'Player {player["full_name"]} has no name or surname')
+            exit()
+
+        player_id = player['full_name']
+        player['player_id'] = player_id
+        contract['player_id'] = player_id
+
+        row = player | contract
+        self.rosters.append({column: row[column] for column in ROSTERS_SCHEMA.names})
+
+        return player_id
+
+    def insert_boxscores(self, teams: list, players: list):
+        self.team_boxscores.extend({column: row[column] for column in TEAM_BOXSCORES_SCHEMA.names} for row in teams)
+        self.player_boxscores.extend({column: row[column] for column in PLAYER_BOXSCORES_SCHEMA.names} for row in players)
+
+    def finish_season(self):
+        if self.actions:
+            self.write_actions(pa.concat_tables(self.actions))
+            self.actions = []
+
+        if self.actions_writer is not None:
+            self.actions_writer.close()
+            self.actions_writer = None
+
+            path = self.get_path('play_by_play')
+            if self.actions_path != path:
+                # write_table goes through a temporary file of the same name
+                table = pq.read_table(self.actions_path)
+                os.remove(self.actions_path)
+                self.write_table('play_by_play', table)
+
+        self.action_games = set()
+
+        for name, rows, schema in (('games', list(self.games.values()), GAMES_SCHEMA), ('teams', self.teams, TEAMS_SCHEMA),
+                                   ('rosters', self.rosters, ROSTERS_SCHEMA),
+                                   ('team_boxscores', self.team_boxscores, TEAM_BOXSCORES_SCHEMA),
+                                   ('player_boxscores', self.player_boxscores, PLAYER_BOXSCORES_SCHEMA)):
+            if rows:
+                self.write_table(name, pa.Table.from_pylist(rows, schema=schema))
+
+        self.games = dict()
+        self.teams = []
+        self.rosters = []
+        self.team_boxscores = []
+        self.player_boxscores = []
+
+    def write_table(self, name, table):
+        os.makedirs(self.dir_path, exist_ok=True)
+        path = self.get_path(name)
+
+        if os.path.exists(path):
+            old_table = pq.read_table(path, schema=table.schema)
+            keys = UNIQUE_KEYS[name]
+            old_keys = self.get_keys(old_table, keys)
+            if name == 'play_by_play':
+                new_keys = pa.array(sorted(self.action_games), pa.string())
+            else:
+                new_keys = self.get_keys(table, keys)
+            # rows written again replace the old ones
+            old_table = old_table.filter(pc.invert(pc.is_in(old_keys, value_set=pc.unique(new_keys))))
+            table = pa.concat_tables([old_table, table])
+
+        if name != 'play_by_play' or self.row_groups == 'season':
+            pq.write_table(table, path, row_group_size=max(table.num_rows, 1))
+            return
+
+        # one row group for each game, whose rows are contiguous
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        game_ids = table['game_id'].to_pylist()
+        with pq.ParquetWriter(tmp_path, table.schema) as writer:
+            start = 0
+            for i in range(1, len(game_ids) + 1):
+                if i == len(game_ids) or game_ids[i] != game_ids[start]:
+                    writer.write_table(table.slice(start, i - start), row_group_size=i - start)
+                    start = i
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def get_keys(table, keys):
+        columns = [pc.cast(table[key], pa.string()) for key in keys]
+        if len(columns) == 1:
+            return columns[0]
+
+        return pc.binary_join_element_wise(*columns, '\x1f')
@@ -1,6 +1,6 @@
 import logging
 from abc import ABC, abstractmethod
-import yaml
+from utils.batch import ActionBatch
 logger = logging.getLogger('sdeng')
 
 
@@ -38,17 +38,36 @@ class Writer(ABC):
         pass
 
     @abstractmethod
-    def check_and_insert_actions(self, actions):
+    def check_and_insert_actions(self, actions: ActionBatch):
         pass
 
     @abstractmethod
     def insert_player_and_contract(self, player, contract):
         pass
 
+    @abstractmethod
+    def insert_boxscores(self, teams: list, players: list):
+        # teams and players are the rows of the box scores of a single game
+        pass
+
+    def append_actions(self, actions: ActionBatch, replace=False):
+        # adds actions to those already written for their game, e.g. the new actions of a game in progress. With replace,
+        # they are the first ones of their game, and replace those already written instead
+        self.check_and_insert_actions(actions)
+
+    def flush(self):
+        # makes the rows written so far readable, e.g. while games in progress are followed
+        pass
+
+    def finish_season(self):
+        # called once all the games of the current season have been inserted
+        pass
+
     def get_mapping(self, mapping_name, directory='mappings'):
         path = f'writers/res/{directory}/{mapping_name}.yml'
 
         if mapping_name not in self.mappings:
+            import yaml
             try:
                 file = open(path, 'rb')
                 mapping = yaml.safe_load(file)